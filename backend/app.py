@@ -1,50 +1,108 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
+import importlib
 import os
+import time
 
 from utils.db import initialize_db, get_db
 from routes.login_routes import init_login_blueprint
-from blueprints.admin_bp import admin_bp
-from blueprints.STAFF import staff_bp
-from blueprints.patient import patient_bp
-from blueprints.doctor import doctor_bp
-from blueprints.appointment_routes import appointment_bp
-from blueprints.pharmacy_model import stock_bp
-from blueprints.prescriptions_bp import prescriptions_bp
-from blueprints.chatbot import chatbot_db
-from blueprints.staff_bp import doct_db
-from blueprints.appointments_bp import appointments_bp
-from blueprints.lab import lab_bp
-from blueprints.machine.diseaseai import disease_bp
-# from blueprints.machine.fetal_seg import 
-from blueprints.machine.fetus_routes import fetus_bp
+# from blueprints.machine.fetal_seg import
+
+# ---------------- Blueprints ----------------
+# (name, module, blueprint attribute, url_prefix), registered in this order
+BLUEPRINTS = [
+    ("admin", "blueprints.admin_bp", "admin_bp", None),
+    ("forecast", "blueprints.STAFF", "staff_bp", None),
+    ("patient", "blueprints.patient", "patient_bp", "/mypatient"),
+    ("doctor", "blueprints.doctor", "doctor_bp", "/amdoctor"),
+    ("appointment", "blueprints.appointment_routes", "appointment_bp", "/appointments"),
+    ("prescriptions", "blueprints.prescriptions_bp", "prescriptions_bp", "/api"),
+    ("chatbot", "blueprints.chatbot", "chatbot_db", None),
+    ("staff", "blueprints.staff_bp", "doct_db", None),
+    ("appointments", "blueprints.appointments_bp", "appointments_bp", None),
+    ("lab", "blueprints.lab", "lab_bp", None),
+    ("disease", "blueprints.machine.diseaseai", "disease_bp", "/disease"),
+    ("fetus", "blueprints.machine.fetus_routes", "fetus_bp", "/machine"),
+    ("stock", "blueprints.pharmacy_model", "stock_bp", None),
+]
+
+# ML blueprints can be switched off, e.g. ML_BLUEPRINTS=none for a login-only
+# worker or ML_BLUEPRINTS=disease for just the disease model. Enabled models
+# load on first use, or in the background at startup with ML_WARMUP=1.
+ML_BLUEPRINT_NAMES = {"forecast", "disease", "fetus"}
+
+def enabled_ml_blueprints():
+    raw = os.getenv("ML_BLUEPRINTS", "all").strip().lower()
+    if raw == "all":
+        return set(ML_BLUEPRINT_NAMES)
+    if raw in ("", "none"):
+        return set()
+    return {name.strip() for name in raw.split(",")} & ML_BLUEPRINT_NAMES
+
 app = Flask(__name__)
 CORS(app)
 
 # Secret key
 app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY", "your-secret-key-here")
 
+startup_report = []
+app_started = time.perf_counter()
+
 # Initialize DB
+started = time.perf_counter()
 initialize_db()
 db = get_db().db
+startup_report.append({"blueprint": "db", "ms": round(1000 * (time.perf_counter() - started), 1), "status": "ok"})
 
 # Register blueprints
+started = time.perf_counter()
 app.register_blueprint(init_login_blueprint(db, "super-secret-key"), url_prefix="/api")
-app.register_blueprint(admin_bp)
-app.register_blueprint(staff_bp)
-app.register_blueprint(patient_bp, url_prefix="/mypatient")
-app.register_blueprint(doctor_bp, url_prefix="/amdoctor")
-app.register_blueprint(appointment_bp, url_prefix="/appointments")
-app.register_blueprint(prescriptions_bp, url_prefix="/api")
-app.register_blueprint(chatbot_db)
-app.register_blueprint(doct_db)
-app.register_blueprint(appointments_bp)
-app.register_blueprint(lab_bp)
-app.register_blueprint(disease_bp,url_prefix="/disease")
-app.register_blueprint(fetus_bp,url_prefix="/machine")
-
-
-
-app.register_blueprint(stock_bp)
+startup_report.append({"blueprint": "login", "ms": round(1000 * (time.perf_counter() - started), 1), "status": "ok"})
+
+ml_enabled = enabled_ml_blueprints()
+warm_up = os.getenv("ML_WARMUP", "0") == "1"
+for name, module_name, attr, url_prefix in BLUEPRINTS:
+    if name in ML_BLUEPRINT_NAMES and name not in ml_enabled:
+        startup_report.append({"blueprint": name, "ms": 0.0, "status": "disabled"})
+        continue
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+        if url_prefix:
+            app.register_blueprint(getattr(module, attr), url_prefix=url_prefix)
+        else:
+            app.register_blueprint(getattr(module, attr))
+        if warm_up and hasattr(module, "warm_up"):
+            module.warm_up()
+        status = "ok"
+    except Exception as e:
+        # One broken optional blueprint should not keep the rest of the API down
+        if name not in ML_BLUEPRINT_NAMES:
+            raise
+        print(f"❌ Error loading {name} blueprint: {e}")
+        status = f"error: {e}"
+    startup_report.append({
+        "blueprint": name,
+        "ms": round(1000 * (time.perf_counter() - started), 1),
+        "status": status
+    })
+
+print(f"✅ App ready in {round(1000 * (time.perf_counter() - app_started), 1)} ms")
+for entry in sorted(startup_report, key=lambda e: -e["ms"]):
+    print(f"   {entry['blueprint']:<14}{entry['ms']:>9} ms  {entry['status']}")
+
+
+@app.route("/api/startup", methods=["GET"])
+def startup():
+    """Per-blueprint import/registration time from this worker's startup."""
+    return jsonify({"blueprints": startup_report, "mlBlueprints": sorted(ml_enabled)})
+
+
+@app.route("/api/db/stats", methods=["GET"])
+def db_stats():
+    """Connection pool use of this worker's shared MongoClient."""
+    return jsonify(get_db().stats())
+
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,224 @@
+"""Concurrency stress test for bed reservation.
+
+Usage (from the backend folder):
+    python -m bench.bed_reservation_stress
+    python -m bench.bed_reservation_stress --admissions 800 --threads 64 --beds 20
+    python -m bench.bed_reservation_stress --mongo local
+
+Fires hundreds of parallel admissions at a small pool of beds through the
+admin blueprint: POST /api/emergency (bedNumber) and POST /api/patients
+(cartNumber) mixed. A wave of parallel transfers follows. Then it checks
+that no bed ended up with two patients, that every 201 owns exactly one
+bed, that every refusal was "Bed is already occupied" (any other status
+fails the run), and that the bed_occupancy board matches the patients
+collection.
+
+Mongo is an in-memory mongomock (`pip install mongomock`), or with
+`--mongo local` the MongoDB the blueprint normally uses. Only the real
+server gives true parallel writes. Local runs use their own STRESS-* wards
+and remove everything they created.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+OCCUPIED = "Bed is already occupied"
+
+
+# Single-document operations mongod runs atomically; mongomock does not
+ATOMIC_OPS = ("insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one",
+              "delete_many", "find_one", "find_one_and_update", "find_one_and_delete", "create_index")
+
+
+def make_mongomock_atomic(mongomock):
+    """Runs each mongomock operation under one lock, as a server would per document.
+
+    Without it, mongomock's own read-then-write inside update_one lets two
+    threads pass the same unique-index check, which is a mock artefact and
+    not the race under test.
+    """
+    import functools
+    import threading
+
+    lock = threading.RLock()
+    collection_class = mongomock.collection.Collection
+
+    def locked(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with lock:
+                return method(*args, **kwargs)
+        return wrapper
+
+    for name in ATOMIC_OPS:
+        setattr(collection_class, name, locked(getattr(collection_class, name)))
+
+    # mongomock also edits projection dicts in place, which races when threads
+    # share a module-level projection; real pymongo never touches them
+    copy_only_fields = collection_class._copy_only_fields
+    collection_class._copy_only_fields = (
+        lambda self, doc, fields, container: copy_only_fields(self, doc, dict(fields) if fields else fields, container))
+
+
+def load_admin(mongo):
+    if mongo == "memory":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("❌ mongomock is required for the in-memory database: pip install mongomock")
+        import pymongo
+
+        make_mongomock_atomic(mongomock)
+
+        shared = mongomock.MongoClient()
+        pymongo.MongoClient = lambda *a, **k: shared
+
+    from flask import Flask
+    import blueprints.admin_bp as admin
+    from utils.patient_keys import ensure_patient_lookup_index
+
+    # The blueprints build their indexes in the background; the test needs the unique ones now.
+    # patientIdKey_unique comes from the chatbot blueprint, which the app always loads
+    admin.bed_occupancy.ensure_indexes(admin.patients_collection)
+    ensure_patient_lookup_index(admin.patients_collection)
+
+    app = Flask(__name__)
+    app.register_blueprint(admin.admin_bp)
+    return admin, app
+
+
+def admit(client, job):
+    ward, bed, route = job
+    if route == "emergency":
+        body = {"patientName": f"Stress {ward}-{bed}", "age": 40, "gender": "F",
+                "condition": "serious", "ward": ward, "bedNumber": bed}
+        response = client.post("/api/emergency", json=body)
+    else:
+        body = {"name": f"Stress {ward}-{bed}", "age": 40, "gender": "M", "type": "IPD",
+                "wardNumber": ward, "cartNumber": bed}
+        response = client.post("/api/patients", json=body)
+    return response.status_code, (response.get_json() or {})
+
+
+def transfer(client, job):
+    patient_id, ward, bed = job
+    response = client.put(f"/api/patients/{patient_id}", json={"wardNumber": ward, "cartNumber": bed})
+    return response.status_code, (response.get_json() or {})
+
+
+def run_wave(app, fn, jobs, threads):
+    def call(job):
+        with app.test_client() as client:
+            return fn(client, job)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(call, jobs))
+    return results, time.perf_counter() - started
+
+
+def summarize(label, results, elapsed):
+    codes = Counter(code for code, _ in results)
+    unexpected = [body for code, body in results if code == 400 and body.get("error") != OCCUPIED]
+    unexpected += [body for code, body in results if code not in (200, 201, 400)]
+    print(f"{label:<11}{len(results):>6} requests in {elapsed:6.2f}s "
+          f"({len(results) / elapsed:7.1f} req/s)  " + ", ".join(f"{c}: {n}" for c, n in sorted(codes.items())))
+    return unexpected
+
+
+def check(admin, wards):
+    """Every bed has at most one patient, and the board agrees with the patients."""
+    from utils.bed_occupancy import occupied_bed
+
+    problems = []
+    holders = {}
+    for patient in admin.patients_collection.find({"wardNumber": {"$in": wards}}):
+        bed = occupied_bed(patient)
+        if bed:
+            holders.setdefault(bed, []).append(patient["_id"])
+    for bed, ids in holders.items():
+        if len(ids) > 1:
+            problems.append(f"bed {bed} double-booked by {len(ids)} patients")
+
+    board = {(r["ward"], r["bed"]): r["_id"] for r in admin.bed_occupancy.collection.find({"ward": {"$in": wards}})}
+    for bed, ids in holders.items():
+        if board.get(bed) not in ids:
+            problems.append(f"bed {bed} missing from the board")
+    for bed in set(board) - set(holders):
+        problems.append(f"board holds {bed} but no patient is in it")
+    return problems, holders
+
+
+def cleanup(admin, wards):
+    cases = [p["emergencyCaseId"] for p in admin.patients_collection.find(
+        {"wardNumber": {"$in": wards}, "emergencyCaseId": {"$exists": True}}, {"emergencyCaseId": 1})]
+    admin.patients_collection.delete_many({"wardNumber": {"$in": wards}})
+    admin.bed_occupancy.collection.delete_many({"ward": {"$in": wards}})
+    admin.emergency_collection.delete_many({"ward": {"$in": wards}})
+    print(f"🧹 Removed stress patients and {len(cases)} emergency cases")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress-test concurrent bed reservation.")
+    parser.add_argument("--admissions", type=int, default=400, help="parallel admission requests")
+    parser.add_argument("--transfers", type=int, default=200, help="parallel transfer requests afterwards")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--wards", type=int, default=4)
+    parser.add_argument("--beds", type=int, default=30, help="beds per ward; fewer beds, more collisions")
+    parser.add_argument("--mongo", choices=["memory", "local"], default="memory")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    admin, app = load_admin(args.mongo)
+    tag = f"{int(time.time()) % 100000:05d}"
+    wards = [f"STRESS-{tag}-{w + 1}" for w in range(args.wards)]
+
+    jobs = [(rng.choice(wards), rng.randint(1, args.beds), rng.choice(["emergency", "patients"]))
+            for _ in range(args.admissions)]
+    results, elapsed = run_wave(app, admit, jobs, args.threads)
+    unexpected = summarize("admissions", results, elapsed)
+    admitted = sum(1 for code, _ in results if code == 201)
+
+    problems, holders = check(admin, wards)
+    if admitted != len(holders):
+        problems.append(f"{admitted} admissions succeeded but {len(holders)} beds are occupied")
+
+    if args.transfers and holders:
+        patient_ids = [ids[0] for ids in holders.values()]
+        jobs = [(str(rng.choice(patient_ids)), rng.choice(wards), rng.randint(1, args.beds))
+                for _ in range(args.transfers)]
+        results, elapsed = run_wave(app, transfer, jobs, args.threads)
+        unexpected += summarize("transfers", results, elapsed)
+        more, after = check(admin, wards)
+        problems += more
+        if len(after) != len(holders):
+            problems.append(f"transfers changed the occupied bed count: {len(holders)} -> {len(after)}")
+
+    total_beds = args.wards * args.beds
+    print(f"Occupied {len(holders)}/{total_beds} beds after {args.admissions} admission attempts")
+
+    if args.mongo == "local":
+        cleanup(admin, wards)
+
+    for body in unexpected[:5]:
+        print(f"⚠️ Unexpected response: {body}")
+    if unexpected:
+        problems.append(f"{len(unexpected)} requests failed with something other than '{OCCUPIED}'")
+    if problems:
+        for problem in problems[:20]:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("✅ No double-booked beds")
+
+
+if __name__ == "__main__":
+    main()
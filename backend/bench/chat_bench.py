@@ -0,0 +1,323 @@
+"""Offline latency benchmark for the chatbot's /chat route.
+
+Usage (from the backend folder):
+    python -m bench.chat_bench --requests 500 --concurrency 8
+    python -m bench.chat_bench --stream --token-rate 20 --latency 0.3
+    python -m bench.chat_bench --corpus my_messages.jsonl --json results.json
+    python -m bench.chat_bench --mongo local
+
+Starts a fake Ollama server (bench/fake_ollama.py) and loads the chatbot_db
+blueprint against it. Mongo is an in-memory mongomock seeded with test
+patients and staff (`pip install mongomock`), or with `--mongo local` the
+MongoDB the blueprint normally uses, as is. Replays a corpus of FAQ,
+symptom and LLM-bound messages through the Flask test client and reports
+p50/p95/p99 latency and throughput for each path the messages took.
+
+A corpus file holds one JSON object per line: {"message": ...} plus an
+optional "patientId".
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from bench.fake_ollama import FakeOllama  # noqa: E402
+
+# ---------------- Default Corpus ----------------
+DEFAULT_CORPUS = [
+    # FAQ
+    "What are the visiting hours?",
+    "Do you accept insurance?",
+    "How can I book an appointment with a doctor",
+    "what is the emergency contact number",
+    "Where is the hospital located?",
+    "when does the pharmacy open",
+    "can i claim my treatment on coverage",
+    # Symptoms
+    "I have fever and headache with body pain",
+    "cough and cold since yesterday, sore throat too",
+    "stomach pain with nausea and vomiting",
+    "chest pain and breathlessness",
+    "I have a feverr and headach",
+    # LLM-bound
+    "Can you explain what an MRI scan is used for?",
+    "Which doctor should I see about my knee injury?",
+    "Is it safe to take paracetamol with my current prescription?",
+    "What does a high cholesterol result in my lab report mean?",
+    "How should I prepare for a blood sugar test tomorrow?",
+    "My child has a rash after eating peanuts, what should I do?",
+    "Tell me about the cardiology department",
+    "What is the difference between a CT scan and an X-ray?",
+]
+
+PATHS = ("faq", "symptom", "retrieval", "llm")
+
+
+# ---------------- Setup ----------------
+def seed_database(client, patients=50):
+    """Test patients (with lab, prescription and appointment history) and staff."""
+    from utils.patient_keys import patient_lookup_keys
+
+    db = client["hospital_db"]
+    specialties = ["Cardiology", "Orthopedics", "Pediatrics", "Neurology", "General Medicine"]
+    db["staff"].insert_many([
+        {"name": f"Dr. Bench {i}", "role": "doctor", "status": "active",
+         "specialization": specialties[i % len(specialties)]}
+        for i in range(10)
+    ])
+
+    docs = []
+    for i in range(patients):
+        doc = {
+            "patientId": f"BENCH{i:04d}",
+            "name": f"Bench Patient {i}",
+            "age": 20 + i % 60,
+            "gender": "Female" if i % 2 else "Male",
+            "labReports": [{"testName": "Lipid Panel", "result": "LDL 160 mg/dL", "date": "2024-01-10"}],
+            "prescriptions": [{"medicine": "Atorvastatin", "dosage": "10mg", "frequency": "Once daily"}],
+            "appointments": [{"date": "2024-02-01", "time": "10:00", "doctor": "Dr. Bench 0"}],
+        }
+        doc.update(patient_lookup_keys(doc))
+        docs.append(doc)
+    db["patients"].insert_many(docs)
+    return [d["patientId"] for d in docs]
+
+
+def load_chatbot(args, ollama_url):
+    """Points the environment at the fakes, then imports the blueprint."""
+    os.environ["OLLAMA_HOST"] = ollama_url
+    os.environ.setdefault("KNOWLEDGE_INDEX_DIR", tempfile.mkdtemp(prefix="chat-bench-index-"))
+    if args.no_cache:
+        os.environ["CHAT_CACHE_SIZE"] = "0"
+
+    patient_ids = []
+    if args.mongo == "memory":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("❌ mongomock is required for the in-memory database: pip install mongomock")
+        import pymongo
+
+        shared = mongomock.MongoClient()
+        pymongo.MongoClient = lambda *a, **k: shared
+        patient_ids = seed_database(shared, args.patients)
+
+    from flask import Flask
+    import blueprints.chatbot as chatbot
+
+    if args.mongo == "local":
+        try:
+            patient_ids = [p["patientId"] for p in chatbot.patients_col.find(
+                {"patientId": {"$exists": True}}, {"patientId": 1}).limit(args.patients)]
+        except Exception as e:
+            print(f"⚠️ Could not read patients from local MongoDB: {e}")
+
+    if not args.no_index:
+        chatbot.rebuild_knowledge_index()
+
+    app = Flask(__name__)
+    app.register_blueprint(chatbot.chatbot_db)
+    return chatbot, app, patient_ids
+
+
+def load_corpus(path):
+    if not path:
+        return [{"message": m} for m in DEFAULT_CORPUS]
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def classify(chatbot, message):
+    """The path /chat will take for `message`."""
+    if chatbot.match_faq(message):
+        return "faq"
+    if chatbot.match_symptoms(message):
+        return "symptom"
+    if chatbot.retrieve_knowledge(message)[0]:
+        return "retrieval"
+    return "llm"
+
+
+# ---------------- Replay ----------------
+def send(client, payload, stream):
+    """Returns (status, seconds to first token, total seconds)."""
+    started = time.perf_counter()
+    if not stream:
+        resp = client.post("/chat", json=payload)
+        elapsed = time.perf_counter() - started
+        return resp.status_code, elapsed, elapsed
+
+    first_token = None
+    resp = client.post("/chat", json=dict(payload, stream=True), buffered=False)
+    try:
+        for chunk in resp.response:
+            if first_token is None and b"event: token" in chunk:
+                first_token = time.perf_counter() - started
+    finally:
+        resp.close()
+    elapsed = time.perf_counter() - started
+    return resp.status_code, first_token or elapsed, elapsed
+
+
+def build_plan(corpus, chatbot, patient_ids, total, patient_share, seed):
+    rng = random.Random(seed)
+    plan = []
+    for i in range(total):
+        entry = corpus[i % len(corpus)] if i < len(corpus) else rng.choice(corpus)
+        payload = {"message": entry["message"]}
+        patient_id = entry.get("patientId")
+        if patient_id is None and patient_ids and rng.random() < patient_share:
+            patient_id = rng.choice(patient_ids)
+        if patient_id:
+            payload.update(patientId=patient_id, patientType="existing")
+        else:
+            payload["patientType"] = "new"
+        plan.append((classify(chatbot, payload["message"]), payload))
+    rng.shuffle(plan)
+    return plan
+
+
+def replay(client, plan, concurrency, stream):
+    results = []
+    lock = threading.Lock()
+
+    def run(item):
+        path, payload = item
+        status, ttft, elapsed = send(client, payload, stream)
+        with lock:
+            results.append((path, status, ttft, elapsed))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run, plan))
+    return results, time.perf_counter() - started
+
+
+# ---------------- Report ----------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(int(math.ceil(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(results, wall_seconds, stream):
+    report = {}
+    for path in PATHS + ("all",):
+        rows = [r for r in results if path == "all" or r[0] == path]
+        if not rows:
+            continue
+        latencies = sorted(r[3] for r in rows)
+        summary = {
+            "count": len(rows),
+            "errors": sum(1 for r in rows if r[1] >= 400),
+            "p50Ms": round(1000 * percentile(latencies, 50), 1),
+            "p95Ms": round(1000 * percentile(latencies, 95), 1),
+            "p99Ms": round(1000 * percentile(latencies, 99), 1),
+            "meanMs": round(1000 * sum(latencies) / len(latencies), 1),
+            "throughputRps": round(len(rows) / wall_seconds, 2) if wall_seconds else 0.0,
+        }
+        if stream:
+            first_tokens = sorted(r[2] for r in rows)
+            summary["ttftP50Ms"] = round(1000 * percentile(first_tokens, 50), 1)
+            summary["ttftP95Ms"] = round(1000 * percentile(first_tokens, 95), 1)
+        report[path] = summary
+    return report
+
+
+def print_report(report, stream):
+    columns = ["count", "errors", "p50Ms", "p95Ms", "p99Ms", "meanMs", "throughputRps"]
+    if stream:
+        columns += ["ttftP50Ms", "ttftP95Ms"]
+    print("\n" + "path".ljust(10) + "".join(c.rjust(14) for c in columns))
+    for path, summary in report.items():
+        print(path.ljust(10) + "".join(str(summary[c]).rjust(14) for c in columns))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot /chat route offline.")
+    parser.add_argument("--requests", type=int, default=300, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--stream", action="store_true", help="use the SSE mode and report time to first token")
+    parser.add_argument("--corpus", help="JSONL file of messages (default: built-in mix)")
+    parser.add_argument("--mongo", choices=["memory", "local"], default="memory")
+    parser.add_argument("--patients", type=int, default=50, help="patients to seed (or sample with --mongo local)")
+    parser.add_argument("--patient-share", type=float, default=0.5, help="fraction of requests sent as a logged-in patient")
+    parser.add_argument("--no-cache", action="store_true", help="disable the LLM response cache")
+    parser.add_argument("--no-index", action="store_true", help="skip building the knowledge index")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Ollama fixed overhead (s)")
+    parser.add_argument("--token-rate", type=float, default=40.0, help="fake Ollama generated tokens/s")
+    parser.add_argument("--prefill-rate", type=float, default=1500.0, help="fake Ollama prompt tokens/s")
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--ollama-parallel", type=int, default=2, help="chats the fake Ollama runs at once")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    fake = FakeOllama(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        prefill_rate=args.prefill_rate,
+        reply_tokens=args.reply_tokens,
+        parallel=args.ollama_parallel
+    )
+    ollama_url = fake.start()
+    print(f"✅ Fake Ollama listening on {ollama_url}")
+
+    chatbot, app, patient_ids = load_chatbot(args, ollama_url)
+    deadline = time.time() + 10
+    while chatbot.model_registry.status != "up" and time.time() < deadline:
+        time.sleep(0.05)
+    if chatbot.model_registry.status != "up":
+        chatbot.model_registry.refresh()
+
+    client = app.test_client()
+    corpus = load_corpus(args.corpus)
+    if args.warmup:
+        warmup = build_plan(corpus, chatbot, patient_ids, args.warmup, args.patient_share, args.seed + 1)
+        replay(client, warmup, args.concurrency, args.stream)
+
+    plan = build_plan(corpus, chatbot, patient_ids, args.requests, args.patient_share, args.seed)
+    print(f"Replaying {len(plan)} requests at concurrency {args.concurrency}"
+          f" ({'stream' if args.stream else 'json'} mode)...")
+    results, wall_seconds = replay(client, plan, args.concurrency, args.stream)
+
+    report = summarize(results, wall_seconds, args.stream)
+    print_report(report, args.stream)
+    extras = {
+        "wallSeconds": round(wall_seconds, 2),
+        "ollamaChats": fake.chats,
+        "responseCache": chatbot.response_cache.stats(),
+        "ollamaQueue": chatbot.ollama_gate.stats(),
+        "prefill": chatbot.prefill_stats.stats(),
+    }
+    print("\n" + json.dumps(extras, indent=2))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "paths": report, **extras}, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+
+    # No writer when the blueprint could not reach MongoDB
+    if hasattr(chatbot, "chat_writer"):
+        chatbot.chat_writer.stop()
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Scaling benchmark for the /api/emergency-beds board.
+
+Usage (from the backend folder):
+    python -m bench.emergency_beds_bench
+    python -m bench.emergency_beds_bench --sizes 100,400,1600 --occupancy 0.9
+
+Builds synthetic emergency wards (20 beds each) with a share of beds
+occupied. It times the old nested-loop board (every bed scans every
+occupied patient, O(wards x beds x patients)) against the hashed occupancy
+map used by the route, checks that both give the same board, and prints
+the time per bed. Runs in memory with no MongoDB.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from bson import ObjectId
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.bed_occupancy import bed_of, emergency_bed_rows  # noqa: E402
+
+BEDS_PER_WARD = 20
+
+
+def make_data(total_beds, occupancy, seed=7):
+    rng = random.Random(seed)
+    wards = [
+        {"_id": ObjectId(), "name": f"ER-{i + 1}", "type": "emergency", "specialty": "trauma",
+         "beds": BEDS_PER_WARD}
+        for i in range(max(1, total_beds // BEDS_PER_WARD))
+    ]
+    patients = []
+    for ward in wards:
+        for bed in rng.sample(range(1, BEDS_PER_WARD + 1), int(BEDS_PER_WARD * occupancy)):
+            patients.append({
+                "_id": ObjectId(),
+                "patientId": f"EM-{len(patients):05d}",
+                "name": f"Casualty {len(patients)}",
+                "condition": rng.choice(["critical", "serious", "stable"]),
+                "wardType": "emergency",
+                "status": "admitted",
+                "wardNumber": str(ward["_id"]),
+                "bedNumber": bed,
+                "assignedDoctor": ObjectId() if rng.random() < 0.7 else None,
+            })
+    return wards, patients
+
+
+def legacy_board(wards, emergency_patients):
+    """The previous get_emergency_beds loop, kept as the baseline."""
+    occupied_beds = {}
+    for patient in emergency_patients:
+        ward_num = patient.get("wardNumber")
+        bed_num = patient.get("bedNumber")
+        if ward_num and bed_num:
+            occupied_beds[f"{ward_num}-{bed_num}"] = patient
+
+    bed_data = []
+    for ward in wards:
+        total_beds = ward.get("beds", 0)
+        for bed_number in range(1, total_beds + 1):
+            is_occupied = False
+            patient_in_bed = None
+            for key, patient in occupied_beds.items():
+                if (str(patient.get("wardNumber")) == str(ward.get("_id")) and
+                        str(patient.get("bedNumber")) == str(bed_number)):
+                    is_occupied = True
+                    patient_in_bed = patient
+                    break
+            bed_info = {
+                "wardId": str(ward["_id"]),
+                "wardName": ward.get("name", ""),
+                "wardType": ward["type"],
+                "bedNumber": bed_number,
+                "status": "occupied" if is_occupied else "available",
+                "specialty": ward.get("specialty", "general"),
+                "totalBeds": total_beds,
+                "availableBeds": total_beds - sum(1 for p in occupied_beds.values()
+                                                 if str(p.get("wardNumber")) == str(ward.get("_id")))
+            }
+            if is_occupied and patient_in_bed:
+                bed_info["patient"] = {
+                    "name": patient_in_bed.get("name", "Unknown"),
+                    "condition": patient_in_bed.get("condition", "Unknown"),
+                    "patientId": patient_in_bed.get("patientId", ""),
+                    "assignedDoctor": str(patient_in_bed.get("assignedDoctor", "")) if patient_in_bed.get("assignedDoctor") else None
+                }
+            bed_data.append(bed_info)
+    return bed_data
+
+
+def occupancy_rows(patients):
+    """What the bed_occupancy collection holds for these patients."""
+    rows = []
+    for p in patients:
+        ward, bed = bed_of(p)
+        rows.append({"_id": p["_id"], "ward": ward, "bed": bed, "patientId": p["patientId"],
+                     "name": p["name"], "condition": p["condition"], "doctorId": p["assignedDoctor"]})
+    return rows
+
+
+def hashed_board(wards, rows):
+    # Same grouping as BedOccupancy.by_ward(), minus the Mongo read
+    board = {}
+    for row in rows:
+        board.setdefault(row["ward"], {})[row["bed"]] = row
+    return emergency_bed_rows(wards, board)
+
+
+def timed(fn, *args, repeat=3):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the emergency bed board.")
+    parser.add_argument("--sizes", default="40,100,200,400,800,1600", help="total emergency beds per run")
+    parser.add_argument("--occupancy", type=float, default=0.8, help="share of beds occupied")
+    parser.add_argument("--legacy-max", type=int, default=1600, help="skip the legacy loop above this many beds")
+    args = parser.parse_args(argv)
+
+    print(f"{'beds':>6}{'patients':>10}{'legacy ms':>12}{'hashed ms':>12}{'legacy us/bed':>15}{'hashed us/bed':>15}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        wards, patients = make_data(size, args.occupancy)
+        beds = len(wards) * BEDS_PER_WARD
+        rows = occupancy_rows(patients)
+        hashed_s, hashed = timed(hashed_board, wards, rows)
+
+        legacy_cell = "-"
+        legacy_per_bed = "-"
+        if beds <= args.legacy_max:
+            legacy_s, legacy = timed(legacy_board, wards, patients, repeat=1)
+            if legacy != hashed:
+                sys.exit(f"❌ Boards differ at {beds} beds")
+            legacy_cell = f"{1000 * legacy_s:.1f}"
+            legacy_per_bed = f"{1e6 * legacy_s / beds:.1f}"
+
+        print(f"{beds:>6}{len(patients):>10}{legacy_cell:>12}{1000 * hashed_s:>12.2f}"
+              f"{legacy_per_bed:>15}{1e6 * hashed_s / beds:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
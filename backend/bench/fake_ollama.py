@@ -0,0 +1,143 @@
+"""Minimal stand-in for the Ollama HTTP API, for benchmarks.
+
+Serves GET /api/tags and POST /api/chat (streamed NDJSON or one JSON body)
+with a simulated cost model: `latency` seconds of fixed overhead, prompt
+prefill at `prefill_rate` tokens/s, then `reply_tokens` generated at
+`token_rate` tokens/s. At most `parallel` chats are generated at once, like
+OLLAMA_NUM_PARALLEL; the rest wait their turn.
+"""
+import datetime
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY_WORDS = (
+    "Thank you for reaching out. Based on what you describe, please follow up with "
+    "the relevant department so a doctor can review your case in detail."
+).split()
+
+
+def _now():
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+
+class FakeOllama:
+    def __init__(self, host="127.0.0.1", port=0, model="llama3:latest", latency=0.05,
+                 token_rate=40.0, prefill_rate=1500.0, reply_tokens=60, parallel=2):
+        self.model = model
+        self.latency = latency
+        self.token_rate = token_rate
+        self.prefill_rate = prefill_rate
+        self.reply_tokens = reply_tokens
+        self.gate = threading.BoundedSemaphore(parallel)
+        self.chats = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ---------------- Cost Model ----------------
+    def prompt_tokens(self, messages):
+        return sum(int(math.ceil(len(m.get("content") or "") / 4.0)) for m in messages)
+
+    def reply_pieces(self):
+        return [(" " if i else "") + REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(self.reply_tokens)]
+
+    def final_chunk(self, prompt_tokens, started, content=""):
+        return {
+            "model": self.model,
+            "created_at": _now(),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.time() - started) * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": self.reply_tokens,
+        }
+
+    # ---------------- HTTP ----------------
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, payload):
+                line = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/api/tags":
+                    return self._send_json({"error": "not found"}, 404)
+                self._send_json({"models": [{
+                    "name": fake.model,
+                    "model": fake.model,
+                    "modified_at": _now(),
+                    "size": 0,
+                    "digest": "",
+                    "details": {},
+                }]})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.rstrip("/") != "/api/chat":
+                    return self._send_json({"error": "not found"}, 404)
+
+                started = time.time()
+                prompt_tokens = fake.prompt_tokens(body.get("messages") or [])
+                pieces = fake.reply_pieces()
+                with fake._lock:
+                    fake.chats += 1
+
+                with fake.gate:
+                    time.sleep(fake.latency + prompt_tokens / fake.prefill_rate)
+                    if not body.get("stream", True):
+                        time.sleep(len(pieces) / fake.token_rate)
+                        return self._send_json(fake.final_chunk(prompt_tokens, started, "".join(pieces)))
+
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for piece in pieces:
+                        self._send_chunk({
+                            "model": fake.model,
+                            "created_at": _now(),
+                            "message": {"role": "assistant", "content": piece},
+                            "done": False,
+                        })
+                        time.sleep(1.0 / fake.token_rate)
+                    self._send_chunk(fake.final_chunk(prompt_tokens, started))
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+
+        return Handler
@@ -1,8 +1,6 @@
 # app.py (Flask Backend)
 from flask import Flask, request, Blueprint,jsonify
 from flask_cors import CORS
-import pandas as pd
-import joblib
 import os
 from datetime import datetime
 import warnings
@@ -10,6 +8,9 @@ import warnings
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
+# pandas and joblib are imported inside the functions that use them, so
+# importing this blueprint (and starting the app) stays cheap.
+
 staff_bp = Blueprint("staff", __name__)
 # CORS(staff_bp)  # Enable CORS for all routes
 
@@ -27,6 +28,8 @@ def create_featured_dataset():
     """
     Creates the featured dataset if it doesn't exist
     """
+    import pandas as pd
+
     try:
         if os.path.exists(FEATURED_DATA_PATH):
             return True
@@ -59,6 +62,8 @@ def load_models():
     """
     Load all trained models
     """
+    import joblib
+
     models = {}
     for model_name, model_path in MODEL_PATHS.items():
         if not os.path.exists(model_path):
@@ -75,6 +80,8 @@ def get_future_exog(target_date_str):
     """
     Generate exogenous variables for future dates
     """
+    import pandas as pd
+
     try:
         # Load data to get the last date
         df = pd.read_csv(FEATURED_DATA_PATH, parse_dates=['date'])
@@ -161,6 +168,9 @@ def retrain_models():
     """
     Retrain all models
     """
+    import pandas as pd
+    import joblib
+
     try:
         # Ensure featured dataset exists
         if not create_featured_dataset():
@@ -208,6 +218,8 @@ def get_featured_data():
     """
     Get the featured dataset (for visualization)
     """
+    import pandas as pd
+
     try:
         if not os.path.exists(FEATURED_DATA_PATH):
             if not create_featured_dataset():
@@ -229,6 +241,9 @@ def get_model_performance():
     """
     Get model performance metrics
     """
+    import pandas as pd
+    import joblib
+
     try:
         if not os.path.exists(FEATURED_DATA_PATH):
             return jsonify({"error": "Featured dataset not found"}), 404
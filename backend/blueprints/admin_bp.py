@@ -1,22 +1,68 @@
 from flask import Flask, request,Blueprint, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 import datetime
+import os
+import queue
+import threading
 import bcrypt
+from utils.roster_cache import staff_roster
+from utils.patient_keys import patient_lookup_keys
+from utils.patient_snapshots import patient_snapshots
+from utils.pagination import (
+    decode_cursor, parse_limit, parse_fields, fetch_page, after_cursor_filter, iter_batches, InvalidCursor
+)
+from utils.streaming import ndjson_response, sse_event, event_stream_response
+from utils.snapshot_cache import SnapshotCache
+from utils.live_board import LiveBoard
+from utils.bulk_import import ImportReport, PayloadError, import_rows, insert_unordered, iter_request_rows
+from utils.bed_occupancy import (
+    BedOccupancy, OCCUPANT_PROJECTION, ward_bed_count, emergency_bed_rows
+)
+from utils.db import get_database
 
 # Initialize Flask
 admin_bp = Blueprint("admin", __name__, url_prefix="/api/admin")
 CORS(admin_bp)  # Allow React frontend to connect
 admin_bp = Blueprint("admin", __name__)
 # MongoDB Connection
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+db = get_database()
 staff_collection = db["staff"]
 departments_collection = db["departments"]
 patients_collection = db["patients"]
 emergency_collection = db["emergency_cases"]
 wards_collection = db["wards"]
+stock_collection = db["stock"]
+
+# Default low-stock threshold, same as the pharmacy stock page
+LOW_STOCK_THRESHOLD = 10
+
+# Materialized ward/bed board, kept in step by every patient write below
+bed_occupancy = BedOccupancy(db["bed_occupancy"], staff_collection, wards_collection)
+
+def ensure_emergency_indexes():
+    """Indexes behind the ER case list: newest-first paging, `since` polling, admission lookup."""
+    try:
+        emergency_collection.create_index([("createdAt", -1), ("_id", -1)], name="createdAt_id")
+        emergency_collection.create_index("updatedAt", name="updatedAt")
+        patients_collection.create_index("emergencyCaseId", name="emergencyCaseId", sparse=True)
+    except Exception as e:
+        print(f"Error creating emergency indexes: {e}")
+
+threading.Thread(
+    target=lambda: (
+        bed_occupancy.ensure_indexes(patients_collection),
+        bed_occupancy.rebuild_if_stale(patients_collection),
+        ensure_emergency_indexes()
+    ),
+    name="admin-indexes",
+    daemon=True
+).start()
+
+# Patients per Mongo batch (and doctor-name lookup) when streaming
+PATIENT_STREAM_BATCH = 500
 
 # Helper functions
 def serialize_doc(doc):
@@ -52,12 +98,58 @@ def get_staff_by_id(id):
 # Add new staff
 @admin_bp.route("/api/staff", methods=["POST"])
 def add_staff():
-    data = request.json
-    if not data or "name" not in data or "role" not in data:
-        return jsonify({"error": "Missing required fields"}), 400
+    try:
+        data = build_staff_doc(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     staff_collection.insert_one(data)
+    staff_roster.invalidate()
     return jsonify({"message": "Staff added successfully"}), 201
 
+def build_staff_doc(data):
+    if not isinstance(data, dict) or "name" not in data or "role" not in data:
+        raise ValueError("Missing required fields")
+    return data
+
+# ------------------- BULK IMPORT -------------------
+# Rows per insert_many round trip
+BULK_IMPORT_CHUNK = int(os.getenv("BULK_IMPORT_CHUNK", "1000"))
+
+def run_bulk_import(build, insert_chunk):
+    """Streams the request body (NDJSON or a JSON array) through import_rows.
+
+    The body is read incrementally, so size is bounded by time, not memory.
+    Returns (report, error) where error is set if the payload broke off.
+    """
+    report = ImportReport(max_errors=parse_limit(request.args.get("maxErrors"), default=1000, maximum=100000))
+    rows = iter_request_rows(request.stream, request.content_type, request.args.get("format"))
+    try:
+        import_rows(rows, build, insert_chunk, chunk_size=BULK_IMPORT_CHUNK, report=report)
+    except PayloadError as e:
+        return report, str(e)
+    return report, None
+
+def bulk_import_response(report, error):
+    result = report.to_dict()
+    if error:
+        result["error"] = error
+        return jsonify(result), 400
+    return jsonify(result), 200
+
+@admin_bp.route("/api/staff/bulk", methods=["POST"])
+def bulk_add_staff():
+    """Imports many staff rows; see bulk_add_patients for the format."""
+    try:
+        report, error = run_bulk_import(
+            build_staff_doc,
+            lambda chunk, report: insert_unordered(staff_collection, chunk, report)
+        )
+        if report.inserted:
+            staff_roster.invalidate()
+        return bulk_import_response(report, error)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Update staff
 @admin_bp.route("/staff/<id>", methods=["PUT"])
 def update_staff(id):
@@ -69,6 +161,9 @@ def update_staff(id):
         result = staff_collection.update_one({"_id": ObjectId(id)}, {"$set": update_data})
         if result.modified_count == 0:
             return jsonify({"error": "Staff not updated"}), 404
+        staff_roster.invalidate()
+        if "name" in update_data:
+            bed_occupancy.rename_doctor(ObjectId(id), update_data["name"])
         updated_staff = staff_collection.find_one({"_id": ObjectId(id)})
         return jsonify(serialize_doc(updated_staff))
     except Exception as e:
@@ -81,6 +176,8 @@ def delete_staff(id):
         result = staff_collection.delete_one({"_id": ObjectId(id)})
         if result.deleted_count == 0:
             return jsonify({"error": "Staff not found"}), 404
+        staff_roster.invalidate()
+        bed_occupancy.rename_doctor(ObjectId(id), None)
         return jsonify({"message": "Staff deleted successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -123,66 +220,171 @@ def serialize_doc(doc):
     else:
         return doc
 
+# Fields the admin patient table and emergency overview read (no embedded
+# lab reports / prescriptions, no password)
+PATIENT_LIST_PROJECTION = {
+    "patientId": 1,
+    "name": 1,
+    "age": 1,
+    "gender": 1,
+    "bloodGroup": 1,
+    "type": 1,
+    "medicalSpecialty": 1,
+    "description": 1,
+    "contact": 1,
+    "insurance": 1,
+    "status": 1,
+    "admissionDate": 1,
+    "assignedDoctor": 1,
+    "wardNumber": 1,
+    "cartNumber": 1,
+}
+
+def doctor_object_id(value):
+    try:
+        return ObjectId(value) if value else None
+    except Exception:
+        return None
+
+def attach_doctor_names(patients):
+    """Sets assignedDoctorName on each patient using one $in query for all doctors."""
+    doctor_ids = {doctor_object_id(p.get("assignedDoctor")) for p in patients} - {None}
+    names = {}
+    if doctor_ids:
+        for doctor in staff_collection.find({"_id": {"$in": list(doctor_ids)}}, {"name": 1}):
+            names[doctor["_id"]] = doctor.get("name")
+
+    for patient in patients:
+        patient["assignedDoctorName"] = names.get(doctor_object_id(patient.get("assignedDoctor")))
+    return patients
+
 @admin_bp.route("/api/patients", methods=["GET"])
 def get_patients():
-    patients = list(patients_collection.find())
+    """All patients as a JSON array (the admin table), or paged / streamed.
+
+    Query params: limit and cursor return {"patients", "nextCursor"} pages
+    in _id order; format=ndjson streams every patient, one per line;
+    fields (comma separated) narrows the columns.
+    """
+    allowed = set(PATIENT_LIST_PROJECTION) | {"assignedDoctorName"}
+    projection = parse_fields(request.args.get("fields"), allowed)
+    if projection is None:
+        projection, with_doctor = dict(PATIENT_LIST_PROJECTION), True
+    else:
+        with_doctor = projection.pop("assignedDoctorName", None) is not None
+        if with_doctor:
+            projection["assignedDoctor"] = 1
 
-    for patient in patients:
-        # Get assigned doctor name
-        if patient.get("assignedDoctor"):
-            try:
-                doctor = staff_collection.find_one({"_id": ObjectId(patient["assignedDoctor"])})
-                patient["assignedDoctorName"] = doctor["name"] if doctor else None
-            except:
-                patient["assignedDoctorName"] = None
-        else:
-            patient["assignedDoctorName"] = None
+    def prepare(patients):
+        # Get assigned doctor names
+        if with_doctor:
+            attach_doctor_names(patients)
+        # ✅ Serialize everything before jsonify
+        return serialize_doc(patients)
 
-    # ✅ Serialize everything before jsonify
-    serialized_patients = serialize_doc(patients)
+    try:
+        cursor = decode_cursor(request.args.get("cursor"))
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify(serialized_patients)
+    if request.args.get("format") == "ndjson":
+        query = after_cursor_filter(["_id"], cursor, descending=False) if cursor else {}
+        rows = patients_collection.find(query, projection).sort("_id", 1).batch_size(PATIENT_STREAM_BATCH)
+        return ndjson_response(
+            patient for batch in iter_batches(rows, PATIENT_STREAM_BATCH) for patient in prepare(batch)
+        )
+
+    if cursor or request.args.get("limit"):
+        limit = parse_limit(request.args.get("limit"), default=100, maximum=1000)
+        patients, next_cursor = fetch_page(patients_collection, {}, projection, cursor=cursor, limit=limit)
+        return jsonify({"patients": prepare(patients), "nextCursor": next_cursor})
+
+    patients = list(patients_collection.find({}, projection))
+    return jsonify(prepare(patients))
+
+def new_patient_id(oid):
+    # The ObjectId's counter end, not its timestamp start, so ids made in the same second differ
+    return f"P-{str(oid)[-8:]}"
+
+def new_emergency_patient_id(oid):
+    return f"EM-{datetime.datetime.now().strftime('%Y%m%d')}-{str(oid)[-8:]}"
+
+# Tries before a clash on the unique patientIdKey index is returned as 409
+PATIENT_ID_ATTEMPTS = 3
+
+def insert_patient(patient_doc, make_id):
+    """insert_one, with a fresh patientId from `make_id(ObjectId())` if the generated one is taken."""
+    for attempt in range(PATIENT_ID_ATTEMPTS):
+        try:
+            return patients_collection.insert_one(patient_doc)
+        except DuplicateKeyError:
+            # _id is always fresh, so the clash is on the unique patientIdKey
+            if attempt == PATIENT_ID_ATTEMPTS - 1:
+                raise
+            patient_doc["patientId"] = make_id(ObjectId())
+            patient_doc.update(patient_lookup_keys(patient_doc))
+
+def build_patient_doc(data):
+    """Patient document for POST /api/patients and bulk import; ValueError on bad input."""
+    patient_type = data.get("type", "OPD")
+    status = "admitted" if patient_type == "IPD" else "registered"
+    admission_date = datetime.datetime.now() if patient_type == "IPD" else None
+
+    # Handle doctor assignment
+    assigned_doctor = None
+    if data.get("assignedDoctor"):
+        try:
+            assigned_doctor = ObjectId(data["assignedDoctor"])
+        except Exception:
+            raise ValueError("Invalid doctor ID")
+
+    oid = ObjectId()
+    patient_doc = {
+        "_id": oid,
+        "patientId": new_patient_id(oid),
+        "name": data.get("name"),
+        "age": data.get("age"),
+        "gender": data.get("gender"),
+        "bloodGroup": data.get("bloodGroup"),
+        "type": patient_type,
+        "medicalSpecialty": data.get("medicalSpecialty"),
+        "description": data.get("description"),
+        "password": data.get("password"),
+        "contact": data.get("contact", {}),
+        "insurance": data.get("insurance", {}),
+        "status": status,
+        "admissionDate": admission_date,
+        "assignedDoctor": assigned_doctor,
+        "wardNumber": data.get("wardNumber"),
+        "cartNumber": data.get("cartNumber")
+    }
+    patient_doc.update(patient_lookup_keys(patient_doc))
+    return patient_doc
 
 # Add new patient
 @admin_bp.route("/api/patients", methods=["POST"])
 def add_patient():
     try:
-        data = request.json
-        patient_type = data.get("type", "OPD")
-        status = "admitted" if patient_type == "IPD" else "registered"
-        admission_date = datetime.datetime.now() if patient_type == "IPD" else None
-
-        # Handle doctor assignment
-        assigned_doctor = None
-        if data.get("assignedDoctor"):
-            try:
-                assigned_doctor = ObjectId(data["assignedDoctor"])
-            except:
-                return jsonify({"error": "Invalid doctor ID"}), 400
-
-        patient_doc = {
-            "patientId": f"P-{str(ObjectId())[:8]}",
-            "name": data.get("name"),
-            "age": data.get("age"),
-            "gender": data.get("gender"),
-            "bloodGroup": data.get("bloodGroup"),
-            "type": patient_type,
-            "medicalSpecialty": data.get("medicalSpecialty"),
-            "description": data.get("description"),
-            "password": data.get("password"),
-            "contact": data.get("contact", {}),
-            "insurance": data.get("insurance", {}),
-            "status": status,
-            "admissionDate": admission_date,
-            "assignedDoctor": assigned_doctor,
-            "wardNumber": data.get("wardNumber"),
-            "cartNumber": data.get("cartNumber")
-        }
-
-        result = patients_collection.insert_one(patient_doc)
+        try:
+            patient_doc = build_patient_doc(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        assigned_doctor = patient_doc["assignedDoctor"]
+
+        # Reserve the bed before the patient exists; the loser of a race gets 400
+        bed = bed_occupancy.bed_key(patient_doc)
+        if bed and not bed_occupancy.claim(patient_doc["_id"], bed):
+            return jsonify({"error": "Bed is already occupied"}), 400
+        try:
+            result = insert_patient(patient_doc, new_patient_id)
+        except Exception:
+            if bed:
+                bed_occupancy.release(patient_doc["_id"])
+            raise
+        bed_occupancy.sync_patient(patient_doc)
 
         # Update doctor status if IPD
-        if assigned_doctor and patient_type == "IPD":
+        if assigned_doctor and patient_doc["type"] == "IPD":
             staff_collection.update_one(
                 {"_id": assigned_doctor},
                 {"$set": {"status": "unavailable"}}
@@ -193,8 +395,54 @@ def add_patient():
             "patientId": patient_doc["patientId"],
             "_id": str(result.inserted_id)
         }), 201
+    except DuplicateKeyError as e:
+        return jsonify({"error": f"Patient already exists: {e}"}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+def build_bulk_patient(data):
+    if not isinstance(data, dict):
+        raise ValueError("Row must be a JSON object")
+    if not data.get("name"):
+        raise ValueError("Missing required field: name")
+    return build_patient_doc(data)
+
+def insert_patient_chunk(chunk, report):
+    """One chunk of a patient import: batch bed claims, one insert_many, batch board sync."""
+    beds = {doc["_id"]: bed_occupancy.bed_key(doc) for _, doc in chunk}
+    refused = bed_occupancy.claim_many([(oid, bed) for oid, bed in beds.items() if bed])
+    if refused:
+        for row, doc in chunk:
+            if doc["_id"] in refused:
+                report.fail(row, "Bed is already occupied")
+        chunk = [(row, doc) for row, doc in chunk if doc["_id"] not in refused]
+
+    inserted, failed = insert_unordered(patients_collection, chunk, report)
+    for doc in failed:
+        if beds[doc["_id"]]:
+            bed_occupancy.release(doc["_id"])
+    bed_occupancy.sync_patients(inserted)
+
+    doctors = list({doc["assignedDoctor"] for doc in inserted if doc["assignedDoctor"] and doc["type"] == "IPD"})
+    if doctors:
+        staff_collection.update_many({"_id": {"$in": doctors}}, {"$set": {"status": "unavailable"}})
+
+@admin_bp.route("/api/patients/bulk", methods=["POST"])
+def bulk_add_patients():
+    """Imports many patients in one request.
+
+    The body is NDJSON (Content-Type application/x-ndjson or ?format=ndjson)
+    or a JSON array of POST /api/patients bodies. Rows are written with
+    unordered insert_many in chunks, so one bad row doesn't stop the rest.
+    The response counts received/inserted/failed rows and lists errors as
+    {"row", "error"} (row = line number or array position), capped by
+    maxErrors.
+    """
+    try:
+        report, error = run_bulk_import(build_bulk_patient, insert_patient_chunk)
+        return bulk_import_response(report, error)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # ------------------- EDIT PATIENT -------------------
 @admin_bp.route("/api/patients/<id>", methods=["PUT"])
 def edit_patient(id):
@@ -202,127 +450,211 @@ def edit_patient(id):
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
-    result = patients_collection.update_one(
-        {"_id": ObjectId(id)},
-        {"$set": data}
-    )
+    # Keep the normalized login keys in step with patientId / name edits
+    data.update(patient_lookup_keys(data))
+
+    # A transfer or readmission claims the new bed first, so two patients can't land on one bed
+    current, held, claimed = None, None, None
+    if any(field in data for field in ("wardNumber", "cartNumber", "bedNumber", "status")):
+        current = patients_collection.find_one({"_id": ObjectId(id)}, OCCUPANT_PROJECTION)
+        if current is None:
+            return jsonify({"error": "Patient not found"}), 404
+        held = bed_occupancy.bed_key(current)
+        bed = bed_occupancy.bed_key({**current, **data})
+        if bed and bed != held:
+            if not bed_occupancy.claim(current["_id"], bed, held):
+                return jsonify({"error": "Bed is already occupied"}), 400
+            claimed = bed
+
+    try:
+        patient = patients_collection.find_one_and_update(
+            {"_id": ObjectId(id)},
+            {"$set": data},
+            projection=OCCUPANT_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception:
+        if claimed:
+            # Move the row back to the old bed, or drop it if there was none
+            if held:
+                bed_occupancy.claim(current["_id"], held, claimed)
+            else:
+                bed_occupancy.release(current["_id"])
+        raise
 
-    if result.matched_count == 0:
+    if patient is None:
+        if claimed:
+            # Deleted after the claim; the row would hold the bed for nobody
+            bed_occupancy.release(current["_id"])
         return jsonify({"error": "Patient not found"}), 404
 
+    # Refreshes the claimed row, or frees the bed once the patient is no longer admitted
+    bed_occupancy.sync_patient(patient)
+
+    patient_snapshots.invalidate_by_id(id)
+    if data.get("patientId"):
+        patient_snapshots.invalidate(data["patientId"])
     return jsonify({"message": "Patient updated successfully"}), 200
 
 
 # ------------------- DELETE PATIENT -------------------
 @admin_bp.route("/api/patients/<id>", methods=["DELETE"])
 def delete_patient(id):
-    result = patients_collection.delete_one({"_id": ObjectId(id)})
+    patient = patients_collection.find_one_and_delete({"_id": ObjectId(id)}, projection={"emergencyCaseId": 1})
 
-    if result.deleted_count == 0:
+    if patient is None:
         return jsonify({"error": "Patient not found"}), 404
 
+    bed_occupancy.remove_patient(ObjectId(id))
+    if patient.get("emergencyCaseId"):
+        # The case's patientAdmitted flag changed; let `since` pollers see it
+        emergency_collection.update_one(
+            {"_id": ObjectId(patient["emergencyCaseId"])},
+            {"$set": {"updatedAt": datetime.datetime.now()}}
+        )
+
+    patient_snapshots.invalidate_by_id(id)
+
     return jsonify({"message": "Patient deleted successfully"}), 200
 
 # ================== WARD & BED MANAGEMENT ==================
 @admin_bp.route("/api/beds", methods=["GET"])
 def get_beds():
     try:
-        patients = list(patients_collection.find())
-        patients_dict = {}
-
-        for p in patients:
-            ward = p.get("wardNumber")
-            bed = p.get("cartNumber")
-            if ward and bed:
-                doctor_name = None
-                if p.get("assignedDoctor"):
-                    try:
-                        doctor = staff_collection.find_one({"_id": ObjectId(p["assignedDoctor"])})
-                        doctor_name = doctor["name"] if doctor else None
-                    except:
-                        doctor_name = None
-                p["doctorName"] = doctor_name
-                if p.get("admissionDate"):
-                    p["admissionDate"] = str(p["admissionDate"])
-                patients_dict[(ward, bed)] = p
+        # Occupied beds straight from the occupancy board, no patient scan
+        occupancy = bed_occupancy.by_ward()
 
         # get wards from DB
-        wards_data = list(wards_collection.find({}, {"_id": 1, "name": 1, "specialty": 1}))
-
-        wards = []
-        for idx, ward_doc in enumerate(wards_data, start=1):
-            beds = []
-            for bed_num in range(1, 11):
-                patient = patients_dict.get((str(idx), str(bed_num))) or patients_dict.get((idx, bed_num))
-                bed = {
-                    "bedNumber": bed_num,
-                    "status": "Admitted" if patient else "Available",
-                    "admissionDate": patient.get("admissionDate") if patient else None,
-                    "patient": {
-                        "name": patient.get("name"),
-                        "age": patient.get("age"),
-                        "gender": patient.get("gender"),
-                        "diagnosis": patient.get("medicalSpecialty"),
-                        "doctor": patient.get("doctorName")
-                    } if patient else None
-                }
-                beds.append(bed)  # FIXED: Changed admin_bpend to append
-
-            ward = {
-                "_id": str(ward_doc["_id"]),
-                "name": ward_doc["name"],
-                "specialty": ward_doc.get("specialty", "General"),  # fetch from DB
-                "beds": beds
-            }
-            wards.append(ward)  # FIXED: Changed admin_bpend to append
+        wards_data = list(wards_collection.find({}, {"_id": 1, "name": 1, "specialty": 1, "beds": 1}))
 
-        return jsonify(wards)
+        return jsonify(ward_board(wards_data, occupancy))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    # ================== DASHBOARD STATS ==================
-@admin_bp.route("/api/dashboard/stats", methods=["GET"])
-def get_dashboard_stats():
-    try:
-        # Patients
-        total_patients = patients_collection.count_documents({})
-        admitted = patients_collection.count_documents({"status": "admitted"})
-        discharged = patients_collection.count_documents({"status": "discharged"})
-
-        # Staff
-        total_staff = staff_collection.count_documents({})
-        doctors = staff_collection.count_documents({"role": "doctor"})
-        nurses = staff_collection.count_documents({"role": "nurse"})
 
-        # Beds
-        total_beds = 5 * 10  # 5 wards * 10 beds
-        occupied_beds = patients_collection.count_documents({"wardNumber": {"$ne": None}})
+def ward_board(wards_data, occupancy):
+    """The /api/beds ward list from ward docs and a `by_ward()` board."""
+    wards = []
+    for idx, ward_doc in enumerate(wards_data, start=1):
+        # Rows are keyed by ward _id; rows written before that used the name or position
+        occupied = {}
+        for key in (ward_doc.get("name"), ward_doc["_id"], idx):
+            occupied.update(occupancy.get(str(key), {}))
+
+        beds = []
+        for bed_num in range(1, ward_bed_count(ward_doc) + 1):
+            row = occupied.get(str(bed_num))
+            admission_date = row.get("admissionDate") if row else None
+            bed = {
+                "bedNumber": bed_num,
+                "status": "Admitted" if row else "Available",
+                "admissionDate": str(admission_date) if admission_date else admission_date,
+                "patient": {
+                    "name": row.get("name"),
+                    "age": row.get("age"),
+                    "gender": row.get("gender"),
+                    "diagnosis": row.get("diagnosis"),
+                    "doctor": row.get("doctorName")
+                } if row else None
+            }
+            beds.append(bed)  # FIXED: Changed admin_bpend to append
 
-        # Inventory (replace with real inventory collection if you have one)
-        inventory_items = 100
-        low_stock = 10
+        ward = {
+            "_id": str(ward_doc["_id"]),
+            "name": ward_doc["name"],
+            "specialty": ward_doc.get("specialty", "General"),  # fetch from DB
+            "beds": beds
+        }
+        wards.append(ward)  # FIXED: Changed admin_bpend to append
 
-        # Alerts (example static, replace with real logic if needed)
-        alerts = 5
-        critical_alerts = 2
+    return wards
 
-        # Bed occupancy percentage
-        bed_occupancy = f"{int((occupied_beds / total_beds) * 100)}%"
+# Recompute the occupancy board from the patients collection
+@admin_bp.route("/api/beds/rebuild", methods=["POST"])
+def rebuild_beds():
+    try:
+        count = bed_occupancy.rebuild(patients_collection)
+        return jsonify({"message": "Bed occupancy rebuilt", "occupiedBeds": count}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    # ================== DASHBOARD STATS ==================
+def facet_counts(collection, facets):
+    """Counts for several filters in one aggregation: {name: filter} -> {name: count}."""
+    pipeline = [{"$facet": {
+        name: [{"$match": query}, {"$count": "n"}] for name, query in facets.items()
+    }}]
+    result = next(collection.aggregate(pipeline), {})
+    return {name: (result.get(name) or [{}])[0].get("n", 0) for name in facets}
+
+def compute_dashboard_stats():
+    # Patients
+    patients = facet_counts(patients_collection, {
+        "total": {},
+        "admitted": {"status": "admitted"},
+        "discharged": {"status": "discharged"},
+    })
+
+    # Staff
+    staff = facet_counts(staff_collection, {
+        "total": {},
+        "doctors": {"role": "doctor"},
+        "nurses": {"role": "nurse"},
+    })
+
+    # Inventory, as the stock page labels it: out of stock at 0, low stock
+    # above 0 and up to the item's threshold (10 by default);
+    # expiryDate is stored as YYYY-MM-DD
+    today = datetime.date.today().isoformat()
+    stock = facet_counts(stock_collection, {
+        "total": {},
+        "low": {
+            "quantity": {"$gt": 0},
+            "$expr": {"$lte": ["$quantity", {"$ifNull": ["$threshold", LOW_STOCK_THRESHOLD]}]}
+        },
+        "out": {"quantity": {"$lte": 0}},
+        "expired": {"expiryDate": {"$lt": today}},
+    })
+
+    # Alerts: low-stock and expired items plus active emergencies;
+    # out-of-stock items and critical emergencies count as critical
+    emergencies = facet_counts(emergency_collection, {
+        "active": {"status": "active"},
+        "critical": {"status": "active", "priority": "critical"},
+    })
+
+    # Beds: the wards' real bed counts and the occupancy board
+    total_beds = sum(ward_bed_count(w) for w in wards_collection.find({}, {"beds": 1}))
+    occupied_beds = bed_occupancy.collection.count_documents({"status": "admitted"})
+
+    # Bed occupancy percentage
+    occupancy_pct = f"{int((occupied_beds / total_beds) * 100)}%" if total_beds else "0%"
+
+    return {
+        "patients": patients["total"],
+        "admitted": patients["admitted"],
+        "discharged": patients["discharged"],
+        "staff": staff["total"],
+        "doctors": staff["doctors"],
+        "nurses": staff["nurses"],
+        "bedOccupancy": occupancy_pct,
+        "totalBeds": total_beds,
+        "occupiedBeds": occupied_beds,
+        "inventoryItems": stock["total"],
+        "lowStock": stock["low"],
+        "outOfStock": stock["out"],
+        "expiredStock": stock["expired"],
+        "activeEmergencies": emergencies["active"],
+        "alerts": stock["low"] + stock["expired"] + emergencies["active"],
+        "criticalAlerts": stock["out"] + emergencies["critical"],
+        "generatedAt": datetime.datetime.utcnow().isoformat() + "Z"
+    }
+
+# Every dashboard polling within the TTL shares one computation
+dashboard_stats = SnapshotCache(compute_dashboard_stats, ttl=int(os.getenv("DASHBOARD_STATS_TTL", "10")))
 
-        return jsonify({
-            "patients": total_patients,
-            "admitted": admitted,
-            "discharged": discharged,
-            "staff": total_staff,
-            "doctors": doctors,
-            "nurses": nurses,
-            "bedOccupancy": bed_occupancy,
-            "totalBeds": total_beds,
-            "occupiedBeds": occupied_beds,
-            "inventoryItems": inventory_items,
-            "lowStock": low_stock,
-            "alerts": alerts,
-            "criticalAlerts": critical_alerts
-        })
+@admin_bp.route("/api/dashboard/stats", methods=["GET"])
+def get_dashboard_stats():
+    try:
+        return jsonify(dashboard_stats.get())
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -359,65 +691,11 @@ def get_emergency_beds():
     try:
         # Get all emergency wards
         wards = list(wards_collection.find({"type": "emergency"}))
-        
-        # Get all admitted patients in emergency wards
-        emergency_patients = list(patients_collection.find({
-            "wardType": "emergency",
-            "status": "admitted"
-        }))
-        
-        # Create a map of occupied beds by wardNumber and bedNumber
-        occupied_beds = {}
-        for patient in emergency_patients:
-            ward_num = patient.get("wardNumber")
-            bed_num = patient.get("bedNumber")
-            if ward_num and bed_num:
-                key = f"{ward_num}-{bed_num}"
-                occupied_beds[key] = patient
-        
-        # Prepare bed data
-        bed_data = []
-        for ward in wards:
-            ward_name = ward.get("name", "")
-            total_beds = ward.get("beds", 0)
-            
-            for bed_number in range(1, total_beds + 1):
-                bed_key = f"{ward.get('_id')}-{bed_number}"  # Use ward ID instead of name
-                
-                # Check if this specific bed is occupied
-                is_occupied = False
-                patient_in_bed = None
-                
-                for key, patient in occupied_beds.items():
-                    if (str(patient.get("wardNumber")) == str(ward.get("_id")) and 
-                        str(patient.get("bedNumber")) == str(bed_number)):
-                        is_occupied = True
-                        patient_in_bed = patient
-                        break
-                
-                bed_info = {
-                    "wardId": str(ward["_id"]),
-                    "wardName": ward_name,
-                    "wardType": ward["type"],
-                    "bedNumber": bed_number,
-                    "status": "occupied" if is_occupied else "available",
-                    "specialty": ward.get("specialty", "general"),
-                    "totalBeds": total_beds,
-                    "availableBeds": total_beds - sum(1 for p in occupied_beds.values() 
-                                                     if str(p.get("wardNumber")) == str(ward.get("_id")))
-                }
-                
-                if is_occupied and patient_in_bed:
-                    bed_info["patient"] = {
-                        "name": patient_in_bed.get("name", "Unknown"),
-                        "condition": patient_in_bed.get("condition", "Unknown"),
-                        "patientId": patient_in_bed.get("patientId", ""),
-                        "assignedDoctor": str(patient_in_bed.get("assignedDoctor", "")) if patient_in_bed.get("assignedDoctor") else None
-                    }
-                
-                bed_data.append(bed_info)  # FIXED: Changed admin_bpend to append
-        
-        return jsonify(bed_data), 200
+
+        # Occupied emergency beds, hashed by ward and bed
+        occupancy = bed_occupancy.by_ward({"wardType": "emergency", "status": "admitted"})
+
+        return jsonify(emergency_bed_rows(wards, occupancy)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -472,15 +750,11 @@ def create_emergency_case():
             except:
                 return jsonify({"error": "Invalid doctor ID"}), 400
         
-        # Check if bed is available
-        if data.get("ward") and data.get("bedNumber"):
-            existing_patient = patients_collection.find_one({
-                "wardNumber": data["ward"],
-                "bedNumber": data["bedNumber"],
-                "status": "admitted"
-            })
-            if existing_patient:
-                return jsonify({"error": "Bed is already occupied"}), 400
+        # Reserve the bed atomically; a concurrent admission to it gets 400
+        patient_oid = ObjectId()
+        bed = bed_occupancy.bed_key({"wardNumber": data.get("ward"), "bedNumber": data.get("bedNumber"), "status": "admitted"})
+        if bed and not bed_occupancy.claim(patient_oid, bed):
+            return jsonify({"error": "Bed is already occupied"}), 400
         
         # Create emergency case record
         emergency_doc = {
@@ -494,18 +768,25 @@ def create_emergency_case():
             "bedNumber": data.get("bedNumber"),
             "assignedDoctor": assigned_doctor,
             "status": "active",
-            "createdAt": datetime.datetime.now()
+            "createdAt": datetime.datetime.now(),
+            "updatedAt": datetime.datetime.now()
         }
         
         # Insert into emergency collection
-        result = emergency_collection.insert_one(emergency_doc)
+        try:
+            result = emergency_collection.insert_one(emergency_doc)
+        except Exception:
+            if bed:
+                bed_occupancy.release(patient_oid)
+            raise
         emergency_id = str(result.inserted_id)
         
-        # Generate patient ID
-        patient_id = f"EM-{datetime.datetime.now().strftime('%Y%m%d')}-{str(result.inserted_id)[:4]}"
+        # Generate patient ID (from the ObjectId's counter end, unique within the day)
+        patient_id = new_emergency_patient_id(patient_oid)
         
         # Create a patient record
         patient_doc = {
+            "_id": patient_oid,
             "patientId": patient_id,
             "name": data["patientName"],
             "age": data["age"],
@@ -520,8 +801,17 @@ def create_emergency_case():
             "admissionDate": datetime.datetime.now(),
             "emergencyCaseId": emergency_id
         }
+        patient_doc.update(patient_lookup_keys(patient_doc))
         
-        patients_collection.insert_one(patient_doc)
+        try:
+            insert_patient(patient_doc, new_emergency_patient_id)
+            patient_id = patient_doc["patientId"]
+        except Exception:
+            if bed:
+                bed_occupancy.release(patient_oid)
+            emergency_collection.delete_one({"_id": result.inserted_id})
+            raise
+        bed_occupancy.sync_patient(patient_doc)
         
         # Update doctor status if assigned
         if assigned_doctor:
@@ -536,33 +826,196 @@ def create_emergency_case():
             "patientId": patient_id
         }), 201
         
+    except DuplicateKeyError as e:
+        return jsonify({"error": f"Patient already exists: {e}"}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # Get all emergency cases
+def parse_since(raw):
+    """ISO-8601 timestamp from the `since` param (a trailing Z is allowed)."""
+    since = datetime.datetime.fromisoformat(raw.strip().replace("Z", "+00:00"))
+    # Case timestamps are stored naive (server local time)
+    return since.astimezone().replace(tzinfo=None) if since.tzinfo else since
+
+def attach_case_details(cases):
+    """doctorName and patientAdmitted for a batch of cases: two queries in total."""
+    doctor_ids = list({c["assignedDoctor"] for c in cases if c.get("assignedDoctor")})
+    names = {}
+    if doctor_ids:
+        for doctor in staff_collection.find({"_id": {"$in": doctor_ids}}, {"name": 1}):
+            names[doctor["_id"]] = doctor.get("name")
+
+    case_ids = [str(c["_id"]) for c in cases]
+    admitted = set()
+    if case_ids:
+        for patient in patients_collection.find({"emergencyCaseId": {"$in": case_ids}}, {"emergencyCaseId": 1}):
+            admitted.add(patient["emergencyCaseId"])
+
+    for case in cases:
+        if case.get("assignedDoctor"):
+            case["doctorName"] = names.get(case["assignedDoctor"], "Unknown")
+        else:
+            case["doctorName"] = None
+        # Check if patient is still admitted
+        case["patientAdmitted"] = str(case["_id"]) in admitted
+    return cases
+
 @admin_bp.route("/api/emergency", methods=["GET"])
 def get_emergency_cases():
+    """Emergency cases, newest first.
+
+    Without paging params the full list is returned as before. With limit,
+    cursor or since the response is {"cases", "nextCursor", "serverTime"}.
+    since (ISO timestamp) returns only cases created or changed after it;
+    pass the previous serverTime to poll for updates.
+    """
     try:
         status_filter = request.args.get("status")
         
         query = {}
         if status_filter:
             query["status"] = status_filter
-        
-        cases = list(emergency_collection.find(query).sort("createdAt", -1))
-        
-        # Enhance cases with doctor information
-        for case in cases:
-            if case.get("assignedDoctor"):
-                doctor = staff_collection.find_one({"_id": case["assignedDoctor"]})
-                case["doctorName"] = doctor["name"] if doctor else "Unknown"
-            else:
-                case["doctorName"] = None
-                
-            # Check if patient is still admitted
-            patient = patients_collection.find_one({"emergencyCaseId": str(case["_id"])})
-            case["patientAdmitted"] = patient is not None
-        
-        return jsonify(serialize_docs(cases)), 200
+
+        paged = any(request.args.get(k) for k in ("limit", "cursor", "since"))
+        if not paged:
+            cases = list(emergency_collection.find(query).sort("createdAt", -1))
+            return jsonify(serialize_docs(attach_case_details(cases))), 200
+
+        server_time = datetime.datetime.now()
+        if request.args.get("since"):
+            try:
+                since = parse_since(request.args["since"])
+            except ValueError:
+                return jsonify({"error": "Invalid since timestamp"}), 400
+            query["$or"] = [{"updatedAt": {"$gt": since}}, {"createdAt": {"$gt": since}}]
+
+        try:
+            cursor = decode_cursor(request.args.get("cursor"))
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+
+        limit = parse_limit(request.args.get("limit"), default=100, maximum=500)
+        cases, next_cursor = fetch_page(
+            emergency_collection, query, sort_fields=("createdAt", "_id"),
+            cursor=cursor, limit=limit, descending=True
+        )
+        return jsonify({
+            "cases": serialize_docs(attach_case_details(cases)),
+            "nextCursor": next_cursor,
+            "serverTime": server_time.isoformat()
+        }), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+# ================== LIVE WARD & ER BOARD ==================
+LIVE_TOPICS = ("beds", "emergencyBeds", "cases")
+LIVE_BOARD_COLLECTIONS = ["patients", "wards", "emergency_cases", "bed_occupancy"]
+LIVE_KEEPALIVE = 15
+
+def live_board_state():
+    """Ward beds, ER beds and active ER cases as one keyed board for LiveBoard."""
+    occupancy = bed_occupancy.by_ward()
+    wards_data = list(wards_collection.find({}, {"_id": 1, "name": 1, "type": 1, "specialty": 1, "beds": 1}))
+
+    state = {}
+    for ward in ward_board(wards_data, occupancy):
+        for bed in ward["beds"]:
+            state[("beds", f"{ward['_id']}:{bed['bedNumber']}")] = {
+                "wardId": ward["_id"],
+                "wardName": ward["name"],
+                "specialty": ward["specialty"],
+                **bed
+            }
+
+    # Same filter as /api/emergency-beds, over the rows already read
+    emergency = {}
+    for ward, beds in occupancy.items():
+        admitted = {bed: row for bed, row in beds.items()
+                    if row.get("wardType") == "emergency" and row.get("status") == "admitted"}
+        if admitted:
+            emergency[ward] = admitted
+    emergency_wards = [w for w in wards_data if w.get("type") == "emergency"]
+    for row in emergency_bed_rows(emergency_wards, emergency):
+        state[("emergencyBeds", f"{row['wardId']}:{row['bedNumber']}")] = row
+
+    cases = list(emergency_collection.find({"status": "active"}).sort("createdAt", -1))
+    for case in serialize_docs(attach_case_details(cases)):
+        state[("cases", case["_id"])] = case
+    return state
+
+def watch_live_board(notify):
+    """Blocks on one change stream over the collections the board is built from."""
+    pipeline = [{"$match": {"ns.coll": {"$in": LIVE_BOARD_COLLECTIONS}}}]
+    with db.watch(pipeline) as stream:
+        for _ in stream:
+            notify()
+
+live_board = LiveBoard(
+    live_board_state,
+    watch=watch_live_board,
+    poll_interval=float(os.getenv("LIVE_POLL_INTERVAL", "2"))
+)
+
+@admin_bp.after_request
+def notify_live_board(response):
+    # Writes through this worker show up at once, whatever the change detection mode
+    if request.method != "GET" and response.status_code < 400:
+        live_board.notify()
+    return response
+
+@admin_bp.route("/api/live/board", methods=["GET"])
+def live_board_stream():
+    """Server-sent events: one `snapshot`, then a `delta` per change.
+
+    Deltas are {"version", "changes": [{"topic", "key", "op", "data"}]} with
+    op "upsert" or "remove". topics (comma list of beds, emergencyBeds,
+    cases) limits what is sent. Replaces polling /api/beds,
+    /api/emergency-beds and /api/emergency.
+    """
+    topics = {t.strip() for t in request.args.get("topics", ",".join(LIVE_TOPICS)).split(",")} & set(LIVE_TOPICS)
+    if not topics:
+        return jsonify({"error": f"topics must be from {', '.join(LIVE_TOPICS)}"}), 400
+
+    def snapshot_event(version, state):
+        payload = {"version": version, "mode": live_board.mode}
+        payload.update({topic: [] for topic in topics})
+        for (topic, _), item in state.items():
+            if topic in topics:
+                payload[topic].append(item)
+        return sse_event(payload, "snapshot", version)
+
+    def generate():
+        try:
+            subscriber, version, state = live_board.subscribe()
+        except Exception as e:
+            yield sse_event({"error": str(e)}, "error")
+            return
+        try:
+            yield snapshot_event(version, state)
+            while True:
+                try:
+                    version, changes = subscriber.get(timeout=LIVE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if subscriber.resync:
+                    # Fell behind and missed deltas: start over from the current board
+                    subscriber.resync = False
+                    while not subscriber.empty():
+                        subscriber.get_nowait()
+                    yield snapshot_event(*live_board.snapshot())
+                    continue
+                changes = [c for c in changes if c["topic"] in topics]
+                if changes:
+                    yield sse_event({"version": version, "changes": changes}, "delta", version)
+        finally:
+            live_board.unsubscribe(subscriber)
+
+    return event_stream_response(generate())
+
+@admin_bp.route("/api/live/status", methods=["GET"])
+def live_board_status():
+    """Change detection mode, subscribers and rebuild counts for the live board."""
+    return jsonify(live_board.stats()), 200
@@ -1,11 +1,11 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
 from bson.objectid import ObjectId
 import datetime
+from utils.patient_snapshots import patient_snapshots
+from utils.db import get_database
 
 appointment_bp = Blueprint("appointment_bp", __name__)
-client = MongoClient("mongodb://localhost:27017/")
-db = client.hospital_db
+db = get_database()
 
 # --- Get all specialties / departments ---
 @appointment_bp.route("/departments", methods=["GET"])
@@ -65,6 +65,7 @@ def add_appointment():
 
     try:
         result = db.appointments.insert_one(appointment)
+        patient_snapshots.invalidate(patient_id)
         return jsonify({"message": "Appointment created", "appointmentId": str(result.inserted_id)}), 201
     except Exception as e:
         return jsonify({"message": "Error adding appointment", "error": str(e)}), 500
@@ -1,12 +1,12 @@
 from flask import Blueprint, request, jsonify
 from bson import ObjectId
-from pymongo import MongoClient
 import datetime
+from utils.patient_snapshots import patient_snapshots
+from utils.db import get_database
 
 appointments_bp = Blueprint("appointments_bp", __name__)
 
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+db = get_database()
 appointments_collection = db["appointments"]
 
 # Get appointments for a doctor
@@ -37,10 +37,13 @@ def update_appointment_status(appointment_id):
         if new_status not in ["approved", "cancelled"]:
             return jsonify({"message": "Invalid status"}), 400
 
-        appointments_collection.update_one(
+        appointment = appointments_collection.find_one_and_update(
             {"_id": ObjectId(appointment_id)},
-            {"$set": {"status": new_status, "updatedAt": datetime.datetime.utcnow()}}
+            {"$set": {"status": new_status, "updatedAt": datetime.datetime.utcnow()}},
+            projection={"patientId": 1}
         )
+        if appointment and appointment.get("patientId"):
+            patient_snapshots.invalidate(appointment["patientId"])
         return jsonify({"message": "Appointment status updated", "status": new_status}), 200
     except Exception as e:
         print("Error updating appointment:", e)
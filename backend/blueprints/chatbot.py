@@ -1,14 +1,32 @@
 import os
-from flask import Flask, request, jsonify, send_from_directory,Blueprint
+from flask import Flask, request, jsonify, send_from_directory,Blueprint, Response, stream_with_context
 from flask_cors import CORS
-import difflib
-import ollama
-from pymongo import MongoClient
+import json
+import threading
 from bson.objectid import ObjectId
-from collections import defaultdict, deque
 import datetime
-from googletrans import Translator
-translator = Translator()
+from utils.lazy_loader import LazyResource
+from utils.model_registry import ModelRegistry, is_connection_error
+from utils.roster_cache import staff_roster
+from utils.patient_snapshots import patient_snapshots
+from utils.chat_matcher import ChatMatcher, load_maps_from_collection
+from utils.response_cache import response_cache
+from utils.write_behind import BatchWriter
+from utils.conversation_memory import create_conversation_memory
+from utils.prompt_builder import PromptBuilder, PrefillStats
+from utils.knowledge_index import (
+    KnowledgeIndex, build_index, passages_from_docs, passages_from_db, passages_from_maps
+)
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.patient_keys import normalize_key, ensure_patient_lookup_index
+from utils.pagination import encode_cursor, decode_cursor, parse_limit, after_cursor_filter, InvalidCursor
+from utils.db import get_database
+
+def load_translator():
+    from googletrans import Translator
+    return Translator()
+
+translator = LazyResource("googletrans Translator", load_translator)
 
 
 
@@ -18,28 +36,89 @@ translator = Translator()
 chatbot_db = Blueprint("chatbot_db", __name__)
 CORS(chatbot_db)
 
-chat_history = defaultdict(list)
-os.environ['OLLAMA_HOST'] = 'http://127.0.0.1:11434'
+os.environ.setdefault('OLLAMA_HOST', 'http://127.0.0.1:11434')
+
+def ollama_client():
+    """The ollama module, imported on first use (it reads OLLAMA_HOST then).
+
+    The model registry's background refresh is usually the first caller.
+    """
+    import ollama
+    return ollama
+
 # ---------------- MongoDB Setup ----------------
+def ensure_chat_indexes(collection):
+    """Indexes behind /api/chat/search: newest-first paging and text search per patient."""
+    try:
+        collection.create_index(
+            [("patientId", 1), ("timestamp", -1), ("_id", -1)],
+            name="patient_timestamp"
+        )
+        collection.create_index(
+            [("patientId", 1), ("user_message", "text"), ("bot_response", "text")],
+            name="patient_text",
+            weights={"user_message": 2, "bot_response": 1}
+        )
+    except Exception as e:
+        print(f"Error creating chat indexes: {e}")
+
+patients_col = None
 try:
-    client = MongoClient("mongodb://localhost:27017/")
-    client.server_info()  # Check if the connection is successful
-    db = client["hospital_db"]
+    db = get_database()  # the worker's shared client from utils.db
+    db.client.server_info()  # Check if the connection is successful
     patients_col = db["patients"]
     staff_col = db["staff"]
     wards_col = db["wards"]
     chat_col = db["chat_history"]  # Make sure this collection exists
+    memory_col = db["chat_memory"]  # Recent turns per patient (mongo memory backend)
+    knowledge_col = db["chatbot_knowledge"]  # Optional FAQ/symptom overrides
+    # Index builds and the login-key backfill can be slow; run them off the import path
+    threading.Thread(
+        target=lambda: (ensure_chat_indexes(chat_col), ensure_patient_lookup_index(patients_col)),
+        name="chat-indexes",
+        daemon=True
+    ).start()
+    staff_roster.bind(staff_col)
+    patient_snapshots.bind(patients_col)
+    # Transcripts are written in the background, in batches
+    chat_writer = BatchWriter(
+        chat_col,
+        name="chat-writer",
+        batch_size=int(os.getenv("CHAT_WRITE_BATCH", "100")),
+        flush_interval=float(os.getenv("CHAT_WRITE_INTERVAL", "1.0"))
+    )
+    # Last 3 Q&A per patient; CHAT_MEMORY_BACKEND=mongo shares it across workers
+    chat_memory = create_conversation_memory(memory_col, max_turns=3)
     
     print("Successfully connected to MongoDB.")
 except Exception as e:
     print(f"Error connecting to MongoDB: {e}")
+    db = None
+    patients_col = None
+    knowledge_col = None
+    chat_writer = None
+    chat_memory = create_conversation_memory(max_turns=3)
     # You might want to handle this more gracefully, e.g., by exiting
     # or returning an error message to the frontend.
 
-chat_history = defaultdict(lambda: deque(maxlen=3))
+# ---------------- Ollama Model Registry ----------------
+model_registry = ModelRegistry(
+    lister=lambda: ollama_client().list(),
+    ttl=int(os.getenv("OLLAMA_MODEL_TTL", "300")),
+    retry_interval=int(os.getenv("OLLAMA_RETRY_INTERVAL", "15")),
+)
+model_registry.start()
+
+# ---------------- Ollama Admission Control ----------------
+# Bounded concurrency so a rush of chats cannot overload the local Ollama
+ollama_gate = AdmissionController(
+    max_concurrent=int(os.getenv("OLLAMA_MAX_CONCURRENT", "2")),
+    max_queue=int(os.getenv("OLLAMA_MAX_QUEUE", "16")),
+    max_wait=float(os.getenv("OLLAMA_MAX_WAIT", "20"))
+)
 
 def store_chat_in_db(patient_id, user_message, bot_response):
-    """Stores the user query and bot response in MongoDB."""
+    """Queues the user query and bot response for a batched write to MongoDB."""
     try:
         doc = {
             "patientId": patient_id,
@@ -47,8 +126,7 @@ def store_chat_in_db(patient_id, user_message, bot_response):
             "bot_response": bot_response,
             "timestamp": datetime.datetime.utcnow()
         }
-        chat_col.insert_one(doc)
-        print(f"Chat stored for patient {patient_id}")
+        chat_writer.submit(doc)
     except Exception as e:
         print(f"Error storing chat in DB: {e}")
 
@@ -62,30 +140,19 @@ faq_map = {
     "what are your operation timings": "Our timings:\n• OPD: 9:00 AM - 6:00 PM\n• Emergency: 24/7\n• Pharmacy: 8:00 AM - 10:00 PM",
 }
 
+# Keyword rules tried in order when no FAQ question matches directly
+faq_keywords = [
+    (["visit", "visiting", "hours", "time"], "what are the visiting hours"),
+    (["insurance", "claim", "coverage"], "do you accept insurance"),
+    (["appointment", "book", "schedule"], "how can i book an appointment"),
+    (["emergency", "urgent", "critical"], "what is the emergency contact number"),
+    (["location", "address", "where"], "where is the hospital located"),
+    (["timing", "open", "close", "hour"], "what are your operation timings"),
+]
+
 def match_faq(user_input: str):
     """Enhanced FAQ matching with fuzzy matching."""
-    query = user_input.lower()
-    
-    # Direct match
-    for q, ans in faq_map.items():
-        if q in query:
-            return ans
-    
-    # Keyword matching for better coverage
-    if any(word in query for word in ["visit", "visiting", "hours", "time"]):
-        return faq_map["what are the visiting hours"]
-    elif any(word in query for word in ["insurance", "claim", "coverage"]):
-        return faq_map["do you accept insurance"]
-    elif any(word in query for word in ["appointment", "book", "schedule"]):
-        return faq_map["how can i book an appointment"]
-    elif any(word in query for word in ["emergency", "urgent", "critical"]):
-        return faq_map["what is the emergency contact number"]
-    elif any(word in query for word in ["location", "address", "where"]):
-        return faq_map["where is the hospital located"]
-    elif any(word in query for word in ["timing", "open", "close", "hour"]):
-        return faq_map["what are your operation timings"]
-    
-    return None
+    return matcher.match_faq(user_input)
 
 # ---------------- Enhanced Symptom Matcher ----------------
 symptom_map = {
@@ -98,29 +165,75 @@ symptom_map = {
 
 def match_symptoms(user_input: str):
     """Enhanced symptom matching with better logic."""
-    user_input = user_input.lower()
-    user_words = set(user_input.split())
-    
-    best_match = None
-    highest_matches = 0
-    
-    for symptoms, info in symptom_map.items():
-        symptom_keywords = symptoms.split()
-        matches = 0
-        
-        for word in symptom_keywords:
-            if word in user_words:
-                matches += 1
-            else:
-                close = difflib.get_close_matches(word, user_words, cutoff=0.7)
-                if close:
-                    matches += 1
-        
-        if matches > highest_matches and matches >= 2:
-            highest_matches = matches
-            best_match = info
-    
-    return best_match
+    return matcher.match_symptoms(user_input)
+
+# ---------------- Compiled Matcher ----------------
+matcher = ChatMatcher(faq_map, faq_keywords, symptom_map)
+
+def reload_matcher():
+    """Rebuilds the matcher from the chatbot_knowledge collection, if it has entries."""
+    global matcher
+    maps = load_maps_from_collection(knowledge_col)
+    if maps is None:
+        matcher = ChatMatcher(faq_map, faq_keywords, symptom_map)
+        return False
+    db_faq_map, db_faq_keywords, db_symptom_map = maps
+    # A collection that only overrides one of the maps keeps the other built-in
+    if not db_faq_map:
+        db_faq_map, db_faq_keywords = faq_map, faq_keywords
+    if not db_symptom_map:
+        db_symptom_map = symptom_map
+    matcher = ChatMatcher(db_faq_map, db_faq_keywords, db_symptom_map)
+    print(f"Chat matcher reloaded: {len(db_faq_map)} FAQs, {len(db_symptom_map)} symptom entries")
+    return True
+
+try:
+    reload_matcher()
+except Exception as e:
+    print(f"Using built-in FAQ/symptom maps: {e}")
+
+# ---------------- Knowledge Retrieval ----------------
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KNOWLEDGE_DOCS_DIR = os.getenv("KNOWLEDGE_DOCS_DIR", os.path.join(BACKEND_DIR, "knowledge"))
+KNOWLEDGE_INDEX_DIR = os.getenv("KNOWLEDGE_INDEX_DIR", os.path.join(BACKEND_DIR, "knowledge_index"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+RETRIEVAL_DIRECT_SCORE = float(os.getenv("RETRIEVAL_DIRECT_SCORE", "0.6"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.15"))
+
+knowledge = KnowledgeIndex.load(KNOWLEDGE_INDEX_DIR)
+
+def rebuild_knowledge_index():
+    """Rebuilds the on-disk index from the FAQ/symptom maps, docs folder and Mongo, then reloads it."""
+    global knowledge
+    passages = passages_from_maps(matcher.faq_map, matcher.symptom_map)
+    passages += passages_from_docs(KNOWLEDGE_DOCS_DIR)
+    try:
+        passages += passages_from_db(db)
+    except Exception as e:
+        print(f"Skipping database passages: {e}")
+    count = build_index(passages, KNOWLEDGE_INDEX_DIR)
+    knowledge = KnowledgeIndex.load(KNOWLEDGE_INDEX_DIR)
+    return count
+
+def retrieve_knowledge(user_message):
+    """Returns (direct_answer, passages).
+
+    A confident top hit is answered directly; otherwise the passages above
+    the minimum score are handed to the prompt.
+    """
+    global knowledge
+    try:
+        if knowledge.changed_on_disk():
+            # Rebuilt by another worker or the build script
+            knowledge = KnowledgeIndex.load(KNOWLEDGE_INDEX_DIR)
+        hits = knowledge.search(user_message, k=RETRIEVAL_TOP_K)
+    except Exception as e:
+        print(f"Knowledge search error: {e}")
+        return None, []
+    if hits and hits[0][0] >= RETRIEVAL_DIRECT_SCORE:
+        best = hits[0][1]
+        return best.get("answer") or best["text"], []
+    return None, [p.get("answer") or p["text"] for score, p in hits if score >= RETRIEVAL_MIN_SCORE]
 
 # ---------------- Helper Functions ----------------
 def latest_prescription_line(patient):
@@ -137,103 +250,210 @@ def next_appointment_line(patient):
         return f"Your next appointment is on {upcoming.get('date','N/A')} with Dr. {upcoming.get('doctor','Unknown')}."
     return "No upcoming appointments in your record."
 
-def build_ollama_prompt(user_message, patient=None, user_id=None, staff_list=None):
-    context = (
-        "You are HealthCare AI, a helpful hospital assistant at City General Hospital. "
-        "You can only answer questions related to healthcare, hospital services, appointments, symptoms, "
-        "doctors, medications, and medical reports. "
-        "If the user asks about anything outside of this domain, politely respond that you are only trained to help with hospital and medical-related queries.\n\n"
-    )
-    
-    # Include staff info if available
-    if staff_list:
-        context += "Hospital Staff:\n"
-        for staff_member in staff_list:
-            context += f"- {staff_member}\n"
-        context += "\n"
-
-    if patient:
-        context += f"Patient Name: {patient.get('name', 'N/A')}\n"
-        context += f"Age: {patient.get('age', 'N/A')}\n"
-        context += f"Gender: {patient.get('gender', 'N/A')}\n"
-
-        user_msg_lower = user_message.lower()
-
-        if "lab" in user_msg_lower or "test" in user_msg_lower:
-            if patient.get("labReports"):
-                latest_lab = patient["labReports"][-1]
-                context += f"Lab Report: {latest_lab.get('testName')} on {latest_lab.get('date')}: {latest_lab.get('results')}\n"
-
-        if "medicine" in user_msg_lower or "prescription" in user_msg_lower:
-            if patient.get("prescriptions"):
-                latest = patient["prescriptions"][-1]
-                meds = ', '.join([f"{m['name']} ({m['dosage']})" for m in latest.get("medicines", [])])
-                context += f"Latest Prescription: {meds} (Date: {latest.get('date')})\n"
-
-        if "appointment" in user_msg_lower or "visit" in user_msg_lower:
-            if patient.get("appointments"):
-                next_app = patient["appointments"][-1]
-                context += f"Next Appointment: {next_app.get('description')} on {next_app.get('date')}\n"
-
-    # Add recent chat history for context if available (last 3 Q&A)
-    if user_id and user_id in chat_history and chat_history[user_id]:
-        context += "\nRecent conversation history:\n"
-        for q, a in chat_history[user_id]:
-            context += f"User: {q}\nAssistant: {a}\n"
-        context += "\n"
-
-    context += f"User query: {user_message}\n\nAssistant:"
-    return context
-
-def ollama_reply_or_fallback(prompt):
-    """Enhanced Ollama response with better error handling."""
+def patient_prompt_fragment(user_message, patient):
+    """Returns the patient lines for the prompt and whether they include record data."""
+    if not patient:
+        return "", False
+
+    context = f"Patient Name: {patient.get('name', 'N/A')}\n"
+    context += f"Age: {patient.get('age', 'N/A')}\n"
+    context += f"Gender: {patient.get('gender', 'N/A')}\n"
+    has_record_data = False
+
+    user_msg_lower = user_message.lower()
+
+    if "lab" in user_msg_lower or "test" in user_msg_lower:
+        if patient.get("labReports"):
+            latest_lab = patient["labReports"][-1]
+            context += f"Lab Report: {latest_lab.get('testName')} on {latest_lab.get('date')}: {latest_lab.get('results')}\n"
+            has_record_data = True
+
+    if "medicine" in user_msg_lower or "prescription" in user_msg_lower:
+        if patient.get("prescriptions"):
+            latest = patient["prescriptions"][-1]
+            meds = ', '.join([f"{m['name']} ({m['dosage']})" for m in latest.get("medicines", [])])
+            context += f"Latest Prescription: {meds} (Date: {latest.get('date')})\n"
+            has_record_data = True
+
+    if "appointment" in user_msg_lower or "visit" in user_msg_lower:
+        if patient.get("appointments"):
+            next_app = patient["appointments"][-1]
+            context += f"Next Appointment: {next_app.get('description')} on {next_app.get('date')}\n"
+            has_record_data = True
+
+    return context, has_record_data
+
+def recent_history(user_id):
+    if not user_id:
+        return []
     try:
-        # First check if Ollama is available and models exist
-        try:
-            available_models = ollama.list()
-            model_names = [model['name'] for model in available_models.get('models', [])]
-            print(f"Available models: {model_names}")
-            
-            # Try preferred models in order
-            preferred_models = ["llama3:instruct", "llama3:latest", "llama2:latest", "mistral:latest"]
-            model_to_use = None
-            for model in preferred_models:
-                if model in model_names:
-                    model_to_use = model
-                    break
-
-            if not model_to_use:
-                model_to_use = "llama3:latest"  # Force to LLaMA3 if nothing matches
-            print(f"✅ Using Ollama model: {model_to_use}")
-
-            
-            if not model_to_use:
-                return "I'm currently undergoing maintenance. Please try again later."
-                
-        except Exception as e:
-            print(f"Error checking Ollama models: {e}")
-            return "AI service is temporarily unavailable. Please contact reception for assistance."
-        
-        response = ollama.chat(
-            model=model_to_use,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        return chat_memory.recent(user_id)
+    except Exception as e:
+        print(f"Error reading conversation memory: {e}")
+        return []
+
+# ---------------- Prompt Assembly ----------------
+SYSTEM_INSTRUCTIONS = (
+    "You are HealthCare AI, a helpful hospital assistant at City General Hospital. "
+    "You can only answer questions related to healthcare, hospital services, appointments, symptoms, "
+    "doctors, medications, and medical reports. "
+    "If the user asks about anything outside of this domain, politely respond that you are only trained to help with hospital and medical-related queries."
+)
+
+prompt_builder = PromptBuilder(
+    SYSTEM_INSTRUCTIONS,
+    budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "1500")),
+    staff_budget=int(os.getenv("PROMPT_STAFF_BUDGET", "400")),
+    history_budget=int(os.getenv("PROMPT_HISTORY_BUDGET", "500")),
+    knowledge_budget=int(os.getenv("PROMPT_KNOWLEDGE_BUDGET", "300"))
+)
+prefill_stats = PrefillStats()
+# Keep the model (and its cached prompt prefix) loaded between chats
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+def build_ollama_messages(user_message, patient=None, history=None, roster=None, passages=None):
+    """Returns (messages, usage, context) for a multi-message Ollama chat.
+
+    The system message (instructions + staff) is the same on every turn;
+    patient details and the query go in the last user message.
+    """
+    fragment = patient_prompt_fragment(user_message, patient)[0]
+    # Stored answers carry the disclaimer, which only wastes prompt tokens
+    turns = [(q, (a or "").replace(MEDICAL_DISCLAIMER, "").strip()) for q, a in history or []]
+    return prompt_builder.build(user_message, fragment, turns, roster, passages)
+
+def reply_cache_key(user_message, patient=None, history=None, context=""):
+    """Cache key for an LLM reply, or None when the prompt is too personal to share.
+
+    Prompts carrying lab, prescription or appointment data, or recent chat
+    history, always go to Ollama.
+    """
+    has_record_data = patient_prompt_fragment(user_message, patient)[1]
+    if has_record_data or history:
+        response_cache.record_bypass()
+        return None
+    return response_cache.make_key(user_message, context)
+
+def record_prefill(usage, response):
+    if usage is None:
+        return
+    usage["promptEvalCount"] = response.get("prompt_eval_count")
+    prefill_stats.record(usage)
+    print(f"Prompt tokens: ~{usage['estimatedPromptTokens']} estimated, "
+          f"{usage['promptEvalCount']} evaluated by Ollama (prefix ~{usage['prefixTokens']})")
+
+def fallback_reply(prompt):
+    """Helpful canned answers used whenever Ollama cannot respond."""
+    if not isinstance(prompt, str):
+        prompt = "\n".join(m["content"] for m in prompt)
+    prompt_lower = prompt.lower()
+
+    if "appointment" in prompt_lower:
+        return "To book an appointment, please call our reception at +91-9876543211."
+    elif "emergency" in prompt_lower:
+        return "For emergencies, please go to the emergency department immediately or call +91-9876543210."
+    elif "prescription" in prompt_lower:
+        return "For prescription queries, please contact your doctor or pharmacy."
+    else:
+        return "I'm here to help with hospital services and medical information. How can I assist you today?"
+
+def ollama_reply_or_fallback(prompt, cache_key=None, urgent=False, usage=None):
+    """Enhanced Ollama response with better error handling.
+
+    `prompt` is a list of chat messages (a plain string is sent as one user
+    message). With a `cache_key`, a cached reply is returned when present
+    and a fresh Ollama reply is cached. Fallback answers are never cached.
+    Calls go through the admission queue; `urgent` messages jump ahead of
+    the rest. Ollama's prompt token count is added to `usage`.
+    """
+    messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+    if cache_key:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        # Model choice comes from the in-memory registry, no ollama.list() per message
+        model_to_use = model_registry.get_model()
+        if not model_to_use:
+            # Ollama is down until the registry's next retry
+            return fallback_reply(prompt)
+
+        with ollama_gate.slot(priority=urgent):
+            response = ollama_client().chat(
+                model=model_to_use,
+                messages=messages,
+                keep_alive=OLLAMA_KEEP_ALIVE
+            )
         print("Ollama response generated successfully")
-        return response.get("message", {}).get("content", "I couldn't generate a response right now.")
-        
+        record_prefill(usage, response)
+        content = response.get("message", {}).get("content")
+        if not content:
+            return "I couldn't generate a response right now."
+        if cache_key:
+            response_cache.put(cache_key, content)
+        return content
+
+    except AdmissionRejected as e:
+        # Ollama is busy, not down: answer from the fallbacks right away
+        print(f"Ollama busy: {e}")
+        return fallback_reply(prompt)
     except Exception as e:
         print(f"Ollama error: {e}")
+        # Only an unreachable server takes Ollama out of rotation; a timeout or
+        # a failed chat is this request's problem
+        if is_connection_error(e):
+            model_registry.mark_failure(e)
         # Provide helpful fallback responses
-        prompt_lower = prompt.lower()
-        
-        if "appointment" in prompt_lower:
-            return "To book an appointment, please call our reception at +91-9876543211."
-        elif "emergency" in prompt_lower:
-            return "For emergencies, please go to the emergency department immediately or call +91-9876543210."
-        elif "prescription" in prompt_lower:
-            return "For prescription queries, please contact your doctor or pharmacy."
+        return fallback_reply(prompt)
+
+def ollama_stream_or_fallback(prompt, cache_key=None, urgent=False, usage=None):
+    """Yields the reply piece by piece as Ollama generates it.
+
+    Falls back to the canned answers if Ollama fails before the first token.
+    A cached reply is yielded in one piece; complete streams are cached.
+    """
+    messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+    if cache_key:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    model_to_use = model_registry.get_model()
+    if not model_to_use:
+        yield fallback_reply(prompt)
+        return
+
+    pieces = []
+    try:
+        with ollama_gate.slot(priority=urgent):
+            for chunk in ollama_client().chat(
+                model=model_to_use,
+                messages=messages,
+                stream=True,
+                keep_alive=OLLAMA_KEEP_ALIVE
+            ):
+                piece = chunk.get("message", {}).get("content", "")
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+                if chunk.get("done"):
+                    record_prefill(usage, chunk)
+        print("Ollama stream finished successfully")
+        if cache_key and pieces:
+            response_cache.put(cache_key, "".join(pieces))
+    except AdmissionRejected as e:
+        print(f"Ollama busy: {e}")
+        yield fallback_reply(prompt)
+    except Exception as e:
+        print(f"Ollama stream error: {e}")
+        if is_connection_error(e):
+            model_registry.mark_failure(e)
+        if not pieces:
+            yield fallback_reply(prompt)
         else:
-            return "I'm here to help with hospital services and medical information. How can I assist you today?"
+            yield "\n\n(The response was interrupted. Please try again.)"
 
 # ---------------- Medical Disclaimer with Tagline ----------------
 MEDICAL_DISCLAIMER = """
@@ -266,9 +486,10 @@ def login():
         }), 200
 
     try:
+        # Single indexed equality lookup on the normalized keys
         user = patients_col.find_one({
-            "patientId": {"$regex": f"^{patientId}$", "$options": "i"},
-            "name": {"$regex": f"^{name}$", "$options": "i"}
+            "patientIdKey": normalize_key(patientId),
+            "nameKey": normalize_key(name)
         })
 
         if user:
@@ -290,115 +511,234 @@ def login():
             "message": f"Server error: {e}"
         }), 500
 
+# ---------------- Chat Helpers ----------------
+def parse_chat_request(data):
+    """Pulls the message, patient ID and patient type out of a chat payload."""
+    user_message = (data.get("message") or "").strip()
+
+    # Handle patient ID
+    raw_patient_id = data.get("patientId")
+    if isinstance(raw_patient_id, list):
+        patient_id = str(raw_patient_id[0]).strip() if raw_patient_id else ""
+    else:
+        patient_id = str(raw_patient_id or "").strip()
+
+    patient_type = (data.get("patientType") or "existing").strip().lower()
+    return user_message, patient_id, patient_type
+
+def load_patient_context(patient_id, patient_type):
+    """Compact, cached snapshot with only the fields the prompt reads."""
+    if patient_type != "existing" or not patient_id:
+        return None
+    return patient_snapshots.get(patient_id)
+
+def load_roster():
+    try:
+        return staff_roster.get()
+    except Exception as e:
+        print(f"Error fetching staff: {e}")
+        return []
+
+def quick_answer(user_message):
+    """FAQ first, then symptoms. Returns None when the LLM has to answer."""
+    return match_faq(user_message) or match_symptoms(user_message)
+
+def remember_exchange(patient_id, user_message, memory_answer, stored_answer):
+    """Stores the exchange in both memory and database."""
+    if patient_id:
+        try:
+            chat_memory.append(patient_id, user_message, memory_answer)
+        except Exception as e:
+            print(f"Error updating conversation memory: {e}")
+        store_chat_in_db(patient_id, user_message, stored_answer)
+
+def sse_event(payload, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(payload)}\n\n"
+
 # ---------------- Chat Route ----------------
 @chatbot_db.route("/chat", methods=["POST"])
 def chat():
     try:
         data = request.get_json(force=True) or {}
-        user_message = (data.get("message") or "").strip()
-
-        # Handle patient ID
-        raw_patient_id = data.get("patientId")
-        if isinstance(raw_patient_id, list):
-            patient_id = str(raw_patient_id[0]).strip() if raw_patient_id else ""
-        else:
-            patient_id = str(raw_patient_id or "").strip()
-
-        patient_type = (data.get("patientType") or "existing").strip().lower()
+        user_message, patient_id, patient_type = parse_chat_request(data)
 
         if not user_message:
             return jsonify({"response": "Please type a message to continue."}), 400
 
-        patient = None
+        if str(data.get("stream", request.args.get("stream", ""))).lower() == "true":
+            return stream_chat(user_message, patient_id, patient_type)
 
-        if patient_type == "existing" and patient_id:
-            pipeline = [
-                {'$match': {'patientId': patient_id}},
-                {'$lookup': {
-                    'from': 'staff',
-                    'localField': 'assignedDoctor',
-                    'foreignField': '_id',
-                    'as': 'assignedDoctor'
-                }},
-                {'$lookup': {
-                    'from': 'wards',
-                    'localField': 'wardNumber',
-                    'foreignField': 'name',
-                    'as': 'wardDetails'
-                }}
-            ]
+        # Check FAQs first, then symptom matches
+        answer = quick_answer(user_message)
+        if answer:
+            remember_exchange(patient_id, user_message, answer, answer + MEDICAL_DISCLAIMER)
+            return jsonify({"response": answer + MEDICAL_DISCLAIMER})
 
-            result = list(patients_col.aggregate(pipeline))
-            if result:
-                patient = result[0]
+        # Then the local knowledge index
+        direct_answer, passages = retrieve_knowledge(user_message)
+        if direct_answer:
+            remember_exchange(patient_id, user_message, direct_answer, direct_answer + MEDICAL_DISCLAIMER)
+            return jsonify({"response": direct_answer + MEDICAL_DISCLAIMER})
 
-        staff_list = []
-        try:
-            staff_docs = list(staff_col.find({}, {'name': 1, 'specialization': 1, '_id': 0}))
-            staff_list = [f"{s['name']} ({s.get('specialization', 'N/A')})" for s in staff_docs]
-        except Exception as e:
-            print(f"Error fetching staff: {e}")
-
-        # Check FAQs first
-        faq_answer = match_faq(user_message)
-        if faq_answer:
-            # Store FAQ response in history
-            if patient_id:
-                chat_history[patient_id].append((user_message, faq_answer))
-                store_chat_in_db(patient_id, user_message, faq_answer + MEDICAL_DISCLAIMER)
-            return jsonify({"response": faq_answer + MEDICAL_DISCLAIMER})
-
-        # Check symptom matches
-        symptom_answer = match_symptoms(user_message)
-        if symptom_answer:
-            # Store symptom response in history
-            if patient_id:
-                chat_history[patient_id].append((user_message, symptom_answer))
-                store_chat_in_db(patient_id, user_message, symptom_answer + MEDICAL_DISCLAIMER)
-            return jsonify({"response": symptom_answer + MEDICAL_DISCLAIMER})
+        # Only the LLM path needs the patient record and staff roster
+        patient = load_patient_context(patient_id, patient_type)
+        history = recent_history(patient_id)
 
         # Use Ollama for other queries
-        prompt = build_ollama_prompt(user_message, patient, patient_id, staff_list)
-        reply = ollama_reply_or_fallback(prompt)
+        messages, usage, context = build_ollama_messages(user_message, patient, history, load_roster(), passages)
+        cache_key = reply_cache_key(user_message, patient, history, context)
+        reply = ollama_reply_or_fallback(messages, cache_key, urgent=matcher.is_urgent(user_message), usage=usage)
         
         final_response = reply + MEDICAL_DISCLAIMER
 
         # Store in both memory and database
-        if patient_id:
-            chat_history[patient_id].append((user_message, final_response))
-            store_chat_in_db(patient_id, user_message, final_response)
+        remember_exchange(patient_id, user_message, final_response, final_response)
 
-        return jsonify({"response": final_response})
+        return jsonify({"response": final_response, "usage": usage})
     
     except Exception as e:
         print(f"Chat route error: {e}")
         error_response = f"Sorry, something went wrong: {e}" + MEDICAL_DISCLAIMER
         return jsonify({"response": error_response}), 500
 
+def stream_chat(user_message, patient_id, patient_type):
+    """Relays the reply as Server-Sent Events.
+
+    Events: `start` right away, one `token` per chunk, the disclaimer as a
+    final `token`, then `done` with the full response. The exchange is saved
+    once the stream finishes.
+    """
+    def generate():
+        # Flush headers and a first event before any DB or LLM work
+        yield sse_event({"status": "started"}, "start")
+        try:
+            answer = quick_answer(user_message)
+            passages = []
+            if not answer:
+                answer, passages = retrieve_knowledge(user_message)
+            if answer:
+                yield sse_event({"token": answer}, "token")
+                memory_answer = answer
+                usage = None
+            else:
+                patient = load_patient_context(patient_id, patient_type)
+                history = recent_history(patient_id)
+                messages, usage, context = build_ollama_messages(user_message, patient, history, load_roster(), passages)
+                cache_key = reply_cache_key(user_message, patient, history, context)
+                pieces = []
+                urgent = matcher.is_urgent(user_message)
+                for piece in ollama_stream_or_fallback(messages, cache_key, urgent, usage):
+                    pieces.append(piece)
+                    yield sse_event({"token": piece}, "token")
+                memory_answer = None
+                answer = "".join(pieces)
+
+            final_response = answer + MEDICAL_DISCLAIMER
+            yield sse_event({"token": MEDICAL_DISCLAIMER}, "token")
+            remember_exchange(patient_id, user_message, memory_answer or final_response, final_response)
+            yield sse_event({"response": final_response, "usage": usage}, "done")
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield sse_event({"response": f"Sorry, something went wrong: {e}" + MEDICAL_DISCLAIMER}, "error")
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 # ---------------- Chat History Search Route ----------------
 @chatbot_db.route("/api/chat/search", methods=["GET"])
 def search_chat():
+    """Pages through a patient's chats, newest first or by text relevance.
+
+    Query params: q (text search over user and bot messages), patientId,
+    limit (max 200), cursor (nextCursor from the previous page) and
+    sort ("relevance", the default when q is given, or "recent").
+    """
     keyword = request.args.get("q", "").strip()
     patient_id = request.args.get("patientId", "").strip()
+    limit = parse_limit(request.args.get("limit"), default=50, maximum=200)
+    sort_mode = request.args.get("sort", "relevance" if keyword else "recent").lower()
+    # Relevance needs a text query; anything else pages by time
+    sort_mode = "relevance" if keyword and sort_mode == "relevance" else "recent"
     
     if not patient_id:
         return jsonify({"success": False, "message": "Patient ID is required."}), 400
 
+    try:
+        # A cursor from the other sort lacks this sort's keys
+        cursor = decode_cursor(request.args.get("cursor"), kind=sort_mode)
+    except InvalidCursor as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
     try:
         query_filter = {"patientId": patient_id}
         if keyword:
-            query_filter["user_message"] = {"$regex": keyword, "$options": "i"}
+            query_filter["$text"] = {"$search": keyword}
+
+        if sort_mode == "relevance":
+            sort_fields = ["score", "timestamp", "_id"]
+            pipeline = [
+                {"$match": query_filter},
+                {"$addFields": {"score": {"$meta": "textScore"}}},
+            ]
+            if cursor:
+                pipeline.append({"$match": after_cursor_filter(sort_fields, cursor)})
+            pipeline += [
+                {"$sort": {"score": -1, "timestamp": -1, "_id": -1}},
+                {"$limit": limit + 1},
+            ]
+            results = list(chat_col.aggregate(pipeline))
+        else:
+            sort_fields = ["timestamp", "_id"]
+            if cursor:
+                query_filter = {"$and": [query_filter, after_cursor_filter(sort_fields, cursor)]}
+            results = list(
+                chat_col.find(query_filter)
+                .sort([("timestamp", -1), ("_id", -1)])
+                .limit(limit + 1)
+            )
+
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            last = results[-1]
+            next_cursor = encode_cursor({f: last.get(f) for f in sort_fields}, kind=sort_mode)
 
-        results = list(chat_col.find(query_filter).sort("timestamp", -1).limit(50))
         for r in results:
             r["_id"] = str(r["_id"])
             r["timestamp"] = r["timestamp"].isoformat() if hasattr(r["timestamp"], 'isoformat') else r["timestamp"]
 
-        return jsonify({"success": True, "results": results}), 200
+        return jsonify({"success": True, "results": results, "nextCursor": next_cursor}), 200
     except Exception as e:
         print(f"Search error: {e}")
         return jsonify({"success": False, "message": f"Search error: {e}"}), 500
 
+# ---------------- Knowledge Reload Route ----------------
+@chatbot_db.route("/api/chat/knowledge/reload", methods=["POST"])
+def reload_knowledge():
+    try:
+        reloaded = reload_matcher()
+        return jsonify({
+            "success": True,
+            "source": "database" if reloaded else "built-in",
+            "faqs": len(matcher.faq_map),
+            "symptoms": len(matcher.symptom_map)
+        }), 200
+    except Exception as e:
+        print(f"Knowledge reload error: {e}")
+        return jsonify({"success": False, "message": f"Reload error: {e}"}), 500
+
+@chatbot_db.route("/api/chat/knowledge/reindex", methods=["POST"])
+def reindex_knowledge():
+    try:
+        count = rebuild_knowledge_index()
+        return jsonify({"success": True, "passages": count}), 200
+    except Exception as e:
+        print(f"Knowledge reindex error: {e}")
+        return jsonify({"success": False, "message": f"Reindex error: {e}"}), 500
+
 # ---------------- Patient Data Route ----------------
 def convert_objectids(doc):
     """Recursively converts all ObjectId instances in a dict/list to strings."""
@@ -464,15 +804,32 @@ def get_all_staff():
         return jsonify({"success": False, "message": f"Server error: {e}"}), 500
 
 # ---------------- Health Check Route ----------------
+def mongo_connected():
+    """Whether the driver currently sees a readable server (its last monitor check, no round trip)."""
+    if patients_col is None:
+        return False
+    try:
+        return db.client.topology_description.has_readable_server()
+    except Exception:
+        return False
+
 @chatbot_db.route("/health", methods=["GET"])
 def health_check():
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.datetime.utcnow().isoformat(),
         "services": {
-            "mongodb": "connected" if patients_col else "disconnected",
-            "ollama": "checking"
+            "mongodb": "connected" if mongo_connected() else "disconnected",
+            "ollama": model_registry.status,
+            "ollamaDetails": model_registry.health()
         },
+        "responseCache": response_cache.stats(),
+        "chatWriter": chat_writer.stats() if chat_writer is not None else None,
+        "chatMemory": chat_memory.stats(),
+        "ollamaQueue": ollama_gate.stats(),
+        "patientSnapshots": patient_snapshots.stats(),
+        "prefill": prefill_stats.stats(),
+        "knowledgePassages": len(knowledge),
         "tagline": "Your HealthGuard AI Companion - Personalized Medical Guidance at Your Fingertips"
     }), 200
 
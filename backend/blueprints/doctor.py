@@ -1,10 +1,9 @@
 from flask import Blueprint, jsonify
-from pymongo import MongoClient
 from bson.json_util import dumps
+from utils.db import get_database
 
 doctor_bp = Blueprint("doctor_bp", __name__)
-client = MongoClient("mongodb://localhost:27017/")
-db = client.hospital_db
+db = get_database()
 
 # Fetch all doctors
 @doctor_bp.route("/", methods=["GET"])
@@ -1,13 +1,13 @@
 from flask import Blueprint, request, jsonify
 from bson import ObjectId
-from pymongo import MongoClient
 import os
 from datetime import datetime
 from werkzeug.utils import secure_filename
+from utils.patient_snapshots import patient_snapshots
+from utils.db import get_database
 
 lab_bp = Blueprint("lab_bp", __name__)
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+db = get_database()
 patients_collection = db["patients"]
 
 UPLOAD_FOLDER = r"C:\Users\prave\OneDrive\Documents\hospital_expo_\clu_care\backend\uploads"
@@ -56,6 +56,7 @@ def add_lab_report():
     )
 
     if result.modified_count == 1:
+        patient_snapshots.invalidate(patientId)
         new_report["_id"] = str(new_report["_id"])
         return jsonify({
             "message": "Lab report added",
@@ -1,6 +1,6 @@
 import random
 from flask import Blueprint, request, jsonify
-from ultralytics import YOLO
+from utils.lazy_loader import LazyResource
 
 # -------------------------------
 # CONFIGURATION
@@ -18,13 +18,17 @@ DOCTOR_NAMES = [
 # -------------------------------
 disease_bp = Blueprint("disease_bp", __name__)
 
-print("Loading YOLO model inside Blueprint...")
-try:
-    model = YOLO(MODEL_PATH)
-    print("✅ Model loaded successfully in Blueprint.")
-except Exception as e:
-    print(f"❌ Error loading YOLO model: {e}")
-    model = None
+def load_model():
+    # ultralytics (and torch) are only imported when the model is first needed
+    from ultralytics import YOLO
+    print("Loading YOLO model inside Blueprint...")
+    return YOLO(MODEL_PATH)
+
+model = LazyResource("Disease YOLO model", load_model)
+
+def warm_up():
+    """Loads the model in the background so the first prediction is fast."""
+    return model.warm_up()
 
 
 # -------------------------------
@@ -43,12 +47,16 @@ def predict():
         # DEBUG print
         print(f"📂 Received file: {file.filename}")
 
+        yolo = model.get()
+        if yolo is None:
+            return jsonify({"error": f"Model not available: {model.error}"}), 503
+
         # Save file temporarily
         temp_path = "temp_upload.jpg"
         file.save(temp_path)
 
         # Run YOLO inference
-        results = model.predict(source=temp_path, save=False, show=False)
+        results = yolo.predict(source=temp_path, save=False, show=False)
         print("✅ YOLO inference complete")
 
         top_class_name = "unknown"
@@ -59,7 +67,7 @@ def predict():
             if hasattr(result, "probs") and result.probs is not None:
                 top_class_index = int(result.probs.top1)
                 top_confidence = float(result.probs.top1conf)
-                top_class_name = model.names.get(top_class_index, "unknown")
+                top_class_name = yolo.names.get(top_class_index, "unknown")
             else:
                 print("⚠️ No probs attribute found (maybe detection model?)")
 
@@ -1,23 +1,37 @@
 # backend/blueprints/machine/fetus_predict.py
 
 from flask import Blueprint, request, jsonify
-from ultralytics import YOLO
-import cv2
 import numpy as np
 import base64
 import io
+from utils.lazy_loader import LazyResource
 
 fetus_bp = Blueprint('fetus_bp', __name__)
 
-# Load YOLOv8 model once
+# Load YOLOv8 model once, on first use (ultralytics is only imported then)
 MODEL_PATH = r'C:\Users\prave\OneDrive\Documents\hospital_expo_\clu_care\backend\blueprints\machine\fetus.pt'
-model = YOLO(MODEL_PATH)
+
+def load_model():
+    from ultralytics import YOLO
+    return YOLO(MODEL_PATH)
+
+model = LazyResource("Fetus YOLO model", load_model)
+
+def warm_up():
+    """Loads the model in the background so the first prediction is fast."""
+    return model.warm_up()
 
 @fetus_bp.route('/predict', methods=['POST'])
 def predict_fetus():
     if 'image' not in request.files:
         return jsonify({"error": "No image file provided"}), 400
 
+    yolo = model.get()
+    if yolo is None:
+        return jsonify({"error": f"Model not available: {model.error}"}), 503
+
+    import cv2
+
     file = request.files['image']
     in_memory_file = file.read()
 
@@ -26,7 +40,7 @@ def predict_fetus():
     img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
 
     # Run prediction
-    results = model.predict(img, conf=0.25, show=False, save=False)
+    results = yolo.predict(img, conf=0.25, show=False, save=False)
     result = results[0]
 
     # Annotate image in memory
@@ -38,7 +52,7 @@ def predict_fetus():
     detections = []
     for box in result.boxes:
         detections.append({
-            "class": model.names[int(box.cls[0].item())],
+            "class": yolo.names[int(box.cls[0].item())],
             "confidence": float(box.conf[0].item())
         })
 
@@ -1,13 +1,14 @@
 import os
 from flask import Blueprint, request, jsonify, send_from_directory
-from pymongo import MongoClient
 from bson import ObjectId
 import datetime
 from werkzeug.utils import secure_filename
+from utils.pagination import decode_cursor, parse_limit, parse_fields, fetch_page, after_cursor_filter, InvalidCursor
+from utils.streaming import ndjson_response
+from utils.db import get_database
 
 patient_bp = Blueprint("patient_bp", __name__)
-client = MongoClient("mongodb://localhost:27017/")
-db = client.hospital_db
+db = get_database()
 
 def serialize_doc(doc):
     """Recursively convert ObjectIds into strings"""
@@ -100,8 +101,30 @@ def get_prescriptions(patient_id):
 # ✅ Get all patients
 @patient_bp.route("/", methods=["GET"])
 def get_all_patients():
+    """All patients as a JSON array, or paged / streamed.
+
+    Query params: limit and cursor return {"patients", "nextCursor"} pages
+    in _id order; format=ndjson streams every patient, one per line;
+    fields (comma separated) returns only those top-level fields.
+    """
     try:
-        patients = list(db.patients.find())
+        projection = parse_fields(request.args.get("fields"))
+        try:
+            cursor = decode_cursor(request.args.get("cursor"))
+        except InvalidCursor as e:
+            return jsonify({"message": str(e)}), 400
+
+        if request.args.get("format") == "ndjson":
+            query = after_cursor_filter(["_id"], cursor, descending=False) if cursor else {}
+            rows = db.patients.find(query, projection).sort("_id", 1).batch_size(500)
+            return ndjson_response(serialize_doc(patient) for patient in rows)
+
+        if cursor or request.args.get("limit"):
+            limit = parse_limit(request.args.get("limit"), default=100, maximum=1000)
+            patients, next_cursor = fetch_page(db.patients, {}, projection, cursor=cursor, limit=limit)
+            return jsonify({"patients": serialize_doc(patients), "nextCursor": next_cursor}), 200
+
+        patients = list(db.patients.find({}, projection))
         patients = serialize_doc(patients)
         return jsonify(patients), 200
     except Exception as e:
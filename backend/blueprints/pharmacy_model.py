@@ -1,9 +1,8 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
+from utils.db import get_database
 
-# MongoDB setup
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+# MongoDB setup (shared client from utils.db)
+db = get_database()
 
 stock_bp = Blueprint('stock_bp', __name__, url_prefix='/appointments')
 
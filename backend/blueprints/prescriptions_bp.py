@@ -1,12 +1,11 @@
 from flask import Blueprint, jsonify
-from pymongo import MongoClient
 from bson import ObjectId, errors
+from utils.db import get_database
 
 prescriptions_bp = Blueprint("prescriptions_bp", __name__)
 
-# MongoDB connection
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+# MongoDB connection (shared client from utils.db)
+db = get_database()
 patients_collection = db["patients"]
 staff_collection = db["staff"]
 
@@ -1,12 +1,13 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
 from bson import ObjectId, errors
+from utils.roster_cache import staff_roster
+from utils.patient_snapshots import patient_snapshots
+from utils.db import get_database
 
 doct_db = Blueprint("doct_db", __name__)
 
-# MongoDB connection
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hospital_db"]
+# MongoDB connection (shared client from utils.db)
+db = get_database()
 staff_collection = db["staff"]
 patients_collection = db["patients"]
 # ---------------- GET DOCTOR PROFILE ----------------
@@ -36,6 +37,7 @@ def update_doctor_status(doctor_id):
             {"_id": ObjectId(doctor_id)},   # convert string to ObjectId
             {"$set": {"status": new_status}}
         )
+        staff_roster.invalidate()
 
         return jsonify({"message": "Status updated", "status": new_status}), 200
     except Exception as e:
@@ -129,6 +131,7 @@ def add_prescription(patient_id):
     )
 
     if result.modified_count == 1:
+        patient_snapshots.invalidate_by_id(patient_obj_id)
         new_prescription["_id"] = str(new_prescription["_id"])
         return jsonify({"message": "Prescription added", "prescription": new_prescription}), 201
     else:
@@ -0,0 +1,13 @@
+"""Rebuilds the chatbot's offline knowledge index.
+
+Usage (from the backend folder):
+    python build_knowledge_index.py
+
+Reads the FAQ/symptom maps, every .md/.txt file in knowledge/ and the
+departments, wards and staff collections, and writes knowledge_index/.
+"""
+from blueprints.chatbot import rebuild_knowledge_index, KNOWLEDGE_INDEX_DIR
+
+if __name__ == "__main__":
+    count = rebuild_knowledge_index()
+    print(f"Indexed {count} passages into {KNOWLEDGE_INDEX_DIR}")
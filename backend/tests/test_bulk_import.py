@@ -0,0 +1,160 @@
+"""Incremental JSON-array / NDJSON parsing and chunked import."""
+import io
+import json
+
+import pytest
+
+from utils.bulk_import import (
+    ImportReport, PayloadError, import_rows, iter_json_array, iter_ndjson, iter_request_rows
+)
+
+ROWS = [
+    {"name": "Asha", "age": 34, "weight": 61.5},
+    {"name": "Ravi \"RK\" Kumar", "note": "line\nbreak", "score": -1.25e3},
+    {"name": "Zoë – ünïcode ✓", "tags": ["a", "b", {"nested": [1, 2, 3]}]},
+    12345678901234567890,
+    1.5e-7,
+    -0.0,
+    "plain string, with [brackets] and {braces}",
+    True,
+    None,
+    [],
+    {},
+]
+
+
+class TrickleStream:
+    """A stream whose read() returns at most `step` bytes, whatever it is asked for."""
+
+    def __init__(self, data, step):
+        self.data = data
+        self.step = step
+        self.position = 0
+
+    def read(self, size=-1):
+        chunk = self.data[self.position:self.position + self.step]
+        self.position += len(chunk)
+        return chunk
+
+
+def parse(data, step):
+    return [data for _, data, _ in iter_json_array(TrickleStream(data, step), chunk_bytes=step)]
+
+
+@pytest.mark.parametrize("step", [1, 2, 3, 5, 7, 64, 65536])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_values_split_across_chunks(step, indent):
+    data = json.dumps(ROWS, indent=indent, ensure_ascii=False).encode("utf-8")
+    assert parse(data, step) == ROWS
+
+
+@pytest.mark.parametrize("step", [1, 2, 3, 4])
+@pytest.mark.parametrize("number", ["1.5e3", "-12.25", "1234567890", "6.02E+23", "0.000001"])
+def test_numbers_split_mid_token(step, number):
+    # "1." + "5e3" must not be read as 1.0
+    data = f"[{number}, {number}]".encode()
+    assert parse(data, step) == [json.loads(number)] * 2
+
+
+@pytest.mark.parametrize("step", [1, 2, 3])
+def test_multibyte_characters_split_across_chunks(step):
+    data = json.dumps(["é", "✓✓", "😀"], ensure_ascii=False).encode("utf-8")
+    assert parse(data, step) == ["é", "✓✓", "😀"]
+
+
+def test_row_numbers_are_array_positions():
+    data = json.dumps(ROWS[:3]).encode()
+    assert [row for row, _, _ in iter_json_array(io.BytesIO(data))] == [1, 2, 3]
+
+
+@pytest.mark.parametrize("data", [b"[]", b"  [ ]  ", b"\n[\n]\n"])
+def test_empty_array(data):
+    assert parse(data, 1) == []
+
+
+@pytest.mark.parametrize("data, rows_before", [
+    (b'{"name": "not an array"}', 0),
+    (b"", 0),
+    (b"[", 0),
+    (b'[{"a": 1}', 1),
+    (b'[{"a": 1},', 1),
+    (b'[{"a": 1} {"b": 2}]', 1),
+    (b'[{"a": 1}, {"b": }]', 1),
+    (b'[{"a": 1}, {"b": 2}', 2),
+    (b'[{"a": 1}, tru]', 1),
+])
+@pytest.mark.parametrize("step", [1, 4, 65536])
+def test_malformed_arrays_raise_after_good_rows(data, rows_before, step):
+    seen = []
+    with pytest.raises(PayloadError):
+        for _, row, _ in iter_json_array(TrickleStream(data, step), chunk_bytes=step):
+            seen.append(row)
+    assert len(seen) == rows_before
+
+
+def test_oversized_row_is_rejected(monkeypatch):
+    import utils.bulk_import as bulk_import
+    monkeypatch.setattr(bulk_import, "MAX_ROW_BYTES", 100)
+    data = b'[{"a": "' + b"x" * 1000 + b'"'  # never closes
+    with pytest.raises(PayloadError):
+        list(iter_json_array(TrickleStream(data, 10), chunk_bytes=10))
+
+
+# ---------------- NDJSON ----------------
+def test_ndjson_reports_bad_lines_and_skips_blank_ones():
+    data = b'{"a": 1}\n\n{"b": \n{"c": 3}\n'
+    rows = list(iter_ndjson(io.BytesIO(data)))
+    assert [(row, value) for row, value, error in rows if error is None] == [(1, {"a": 1}), (4, {"c": 3})]
+    assert [row for row, _, error in rows if error] == [3]
+
+
+def test_format_choice():
+    ndjson = io.BytesIO(b'{"a": 1}\n')
+    assert list(iter_request_rows(ndjson, "application/x-ndjson"))[0][1] == {"a": 1}
+    array = io.BytesIO(b'[{"a": 1}]')
+    assert list(iter_request_rows(array, "application/json"))[0][1] == {"a": 1}
+    forced = io.BytesIO(b'{"a": 1}\n')
+    assert list(iter_request_rows(forced, "application/json", fmt="ndjson"))[0][1] == {"a": 1}
+
+
+# ---------------- import_rows ----------------
+def build(data):
+    if not isinstance(data, dict) or "name" not in data:
+        raise ValueError("Missing required field: name")
+    return data
+
+
+def test_import_rows_chunks_and_reports_errors():
+    chunks = []
+
+    def insert_chunk(chunk, report):
+        chunks.append([row for row, _ in chunk])
+        report.inserted += len(chunk)
+
+    rows = [(i, {"name": i} if i % 4 else {}, None) for i in range(1, 11)]
+    report = import_rows(rows, build, insert_chunk, chunk_size=3).to_dict()
+    assert chunks == [[1, 2, 3], [5, 6, 7], [9, 10]]
+    assert (report["received"], report["inserted"], report["failed"]) == (10, 8, 2)
+    assert [e["row"] for e in report["errors"]] == [4, 8]
+
+
+def test_import_rows_writes_rows_read_before_a_payload_error():
+    inserted = []
+
+    def insert_chunk(chunk, report):
+        inserted.extend(row for row, _ in chunk)
+
+    data = b'[{"name": 1}, {"name": 2}, oops]'
+    with pytest.raises(PayloadError):
+        import_rows(iter_json_array(io.BytesIO(data)), build, insert_chunk, chunk_size=10)
+    assert inserted == [1, 2]
+
+
+def test_report_caps_errors():
+    report = ImportReport(max_errors=2)
+    for row in (5, 3, 9):
+        report.fail(row, "bad")
+    result = report.to_dict()
+    assert result["failed"] == 3
+    assert [e["row"] for e in result["errors"]] == [3, 5]
+    assert result["errorsTruncated"] is True
@@ -0,0 +1,166 @@
+"""ChatMatcher against the original scan-everything matchers it replaced."""
+import difflib
+import random
+import threading
+import time
+
+import pytest
+
+from utils import chat_matcher
+from utils.chat_matcher import ChatMatcher
+
+FAQ_MAP = {
+    "what are the visiting hours": "visiting",
+    "do you accept insurance": "insurance",
+    "how can i book an appointment": "appointment",
+    "what is the emergency contact number": "emergency",
+    "where is the hospital located": "location",
+    "what are your operation timings": "timings",
+}
+
+FAQ_KEYWORDS = [
+    (["visit", "visiting", "hours", "time"], "what are the visiting hours"),
+    (["insurance", "claim", "coverage"], "do you accept insurance"),
+    (["appointment", "book", "schedule"], "how can i book an appointment"),
+    (["emergency", "urgent", "critical"], "what is the emergency contact number"),
+    (["location", "address", "where"], "where is the hospital located"),
+    (["timing", "open", "close", "hour"], "what are your operation timings"),
+]
+
+SYMPTOM_MAP = {
+    "fever headache body pain": "viral fever",
+    "cough cold sore throat": "cold",
+    "chest pain breathlessness": "emergency: chest",
+    "stomach pain nausea vomiting": "gastritis",
+    "headache dizziness": "evaluation",
+}
+
+
+# ---------------- Baseline (the original chatbot functions) ----------------
+def baseline_match_faq(user_input):
+    query = user_input.lower()
+    for q, ans in FAQ_MAP.items():
+        if q in query:
+            return ans
+    for words, question in FAQ_KEYWORDS:
+        if any(word in query for word in words):
+            return FAQ_MAP[question]
+    return None
+
+
+def baseline_match_symptoms(user_input):
+    user_words = set(user_input.lower().split())
+    best_match = None
+    highest_matches = 0
+    for symptoms, info in SYMPTOM_MAP.items():
+        matches = 0
+        for word in symptoms.split():
+            if word in user_words:
+                matches += 1
+            elif difflib.get_close_matches(word, user_words, cutoff=0.7):
+                matches += 1
+        if matches > highest_matches and matches >= 2:
+            highest_matches = matches
+            best_match = info
+    return best_match
+
+
+# ---------------- Corpus ----------------
+VOCAB = sorted({w for s in SYMPTOM_MAP for w in s.split()} | {w for q in FAQ_MAP for w in q.split()}
+               | {w for words, _ in FAQ_KEYWORDS for w in words})
+FILLER = ["i", "have", "a", "my", "since", "yesterday", "and", "bad", "really", "please", "doctor", "help"]
+
+
+def typo(word, rng):
+    if len(word) < 3:
+        return word
+    i = rng.randrange(len(word))
+    op = rng.choice(["drop", "swap", "double", "replace"])
+    if op == "drop":
+        return word[:i] + word[i + 1:]
+    if op == "swap" and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if op == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+
+
+def make_corpus(size=600, seed=11):
+    rng = random.Random(seed)
+    messages = list(FAQ_MAP) + [f"hi, {q} today?" for q in FAQ_MAP]
+    for _ in range(size):
+        words = [rng.choice(VOCAB + FILLER) for _ in range(rng.randint(1, 8))]
+        words = [typo(w, rng) if rng.random() < 0.3 else w for w in words]
+        messages.append(" ".join(w.upper() if rng.random() < 0.1 else w for w in words))
+    return messages
+
+
+CORPUS = make_corpus()
+
+
+@pytest.fixture
+def matcher():
+    return ChatMatcher(FAQ_MAP, FAQ_KEYWORDS, SYMPTOM_MAP)
+
+
+@pytest.mark.parametrize("message", CORPUS)
+def test_match_faq_matches_baseline(matcher, message):
+    assert matcher.match_faq(message) == baseline_match_faq(message)
+
+
+@pytest.mark.parametrize("message", CORPUS)
+def test_match_symptoms_matches_baseline(matcher, message):
+    assert matcher.match_symptoms(message) == baseline_match_symptoms(message)
+
+
+def test_memoized_results_match_baseline(matcher):
+    # Second pass is answered from the per-word memo
+    for _ in range(2):
+        for message in CORPUS:
+            assert matcher.match_symptoms(message) == baseline_match_symptoms(message)
+
+
+class SlowSequenceMatcher(difflib.SequenceMatcher):
+    """Yields to other threads mid-comparison, so any matcher shared between threads gets clobbered."""
+
+    def ratio(self):
+        time.sleep(0.0002)
+        return super().ratio()
+
+
+def test_concurrent_matching_matches_baseline(monkeypatch):
+    monkeypatch.setattr(chat_matcher, "SequenceMatcher", SlowSequenceMatcher)
+    # A fresh matcher so the threads race on computing (and memoizing) the same words
+    matcher = ChatMatcher(FAQ_MAP, FAQ_KEYWORDS, SYMPTOM_MAP)
+    messages = CORPUS[:150]
+    expected = {message: baseline_match_symptoms(message) for message in messages}
+    mismatches = []
+    start = threading.Barrier(8)
+
+    def run(offset):
+        start.wait()
+        for message in messages[offset:] + messages[:offset]:
+            if matcher.match_symptoms(message) != expected[message]:
+                mismatches.append(message)
+
+    threads = [threading.Thread(target=run, args=(i * len(messages) // 8,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert mismatches == []
+
+
+def test_fuzzy_keywords_match_get_close_matches(matcher):
+    rng = random.Random(3)
+    words = [typo(w, rng) for w in VOCAB for _ in range(5)] + VOCAB
+    for word in words:
+        expected = {k for k in matcher.keyword_index if difflib.get_close_matches(k, [word], cutoff=0.7)}
+        assert matcher._fuzzy_keywords(word) == expected
+
+
+def test_memo_is_bounded():
+    matcher = ChatMatcher(FAQ_MAP, FAQ_KEYWORDS, SYMPTOM_MAP, memo_size=10)
+    for i in range(50):
+        matcher._fuzzy_keywords(f"word{i}")
+    assert len(matcher._memo) == 10
@@ -0,0 +1,114 @@
+"""Cursor encoding and the /api/chat/search cursor checks."""
+import datetime
+import importlib
+import sys
+
+import pytest
+from bson import ObjectId
+
+from utils.pagination import InvalidCursor, after_cursor_filter, decode_cursor, encode_cursor
+
+
+# ---------------- encode / decode ----------------
+def test_round_trip_keeps_types():
+    values = {
+        "timestamp": datetime.datetime(2026, 3, 1, 12, 30, 45, 123000),
+        "_id": ObjectId(),
+        "score": 1.75,
+        "name": "Ward é",
+    }
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+def test_token_is_url_safe():
+    token = encode_cursor({"_id": ObjectId(), "q": "?&=/+" * 5})
+    assert set(token) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+
+
+def test_empty_token_is_no_cursor():
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+# Not base64, a JSON array ("[1,2]") rather than an object, a bad ObjectId
+@pytest.mark.parametrize("token", ["not-base64!", "WzEsMl0", encode_cursor({"_id": {"$oid": "zz"}})])
+def test_malformed_token_is_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_kind_round_trip():
+    values = {"score": 2.5, "_id": ObjectId()}
+    assert decode_cursor(encode_cursor(values, kind="relevance"), kind="relevance") == values
+
+
+@pytest.mark.parametrize("made_for, used_for", [
+    ("recent", "relevance"),
+    ("relevance", "recent"),
+    (None, "recent"),
+    ("recent", None),
+])
+def test_kind_mismatch_is_rejected(made_for, used_for):
+    token = encode_cursor({"_id": ObjectId()}, kind=made_for)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, kind=used_for)
+
+
+def test_after_cursor_filter_is_strictly_after():
+    cursor = {"timestamp": 5, "_id": 9}
+    assert after_cursor_filter(["timestamp", "_id"], cursor) == {"$or": [
+        {"timestamp": {"$lt": 5}},
+        {"timestamp": 5, "_id": {"$lt": 9}},
+    ]}
+    assert after_cursor_filter(["_id"], cursor, descending=False) == {"$or": [{"_id": {"$gt": 9}}]}
+
+
+# ---------------- /api/chat/search ----------------
+@pytest.fixture(scope="module")
+def chat_client():
+    mongomock = pytest.importorskip("mongomock")
+    pytest.importorskip("googletrans")
+    import pymongo
+
+    if "utils.db" in sys.modules:
+        pytest.skip("utils.db already bound to another client")
+    original = pymongo.MongoClient
+    shared = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *a, **k: shared
+    try:
+        chatbot = importlib.import_module("blueprints.chatbot")
+    finally:
+        pymongo.MongoClient = original
+    from flask import Flask
+
+    chatbot.chat_col.insert_many([
+        {"patientId": "P-1", "user_message": f"question {i}", "bot_response": "answer",
+         "timestamp": datetime.datetime(2026, 1, 1, 9, i)}
+        for i in range(5)
+    ])
+    app = Flask(__name__)
+    app.register_blueprint(chatbot.chatbot_db)
+    return app.test_client()
+
+
+def test_recent_pages_follow_cursor(chat_client):
+    first = chat_client.get("/api/chat/search?patientId=P-1&limit=2").get_json()
+    assert [r["user_message"] for r in first["results"]] == ["question 4", "question 3"]
+    second = chat_client.get(f"/api/chat/search?patientId=P-1&limit=2&cursor={first['nextCursor']}").get_json()
+    assert [r["user_message"] for r in second["results"]] == ["question 2", "question 1"]
+
+
+def test_cursor_replayed_under_other_sort_is_400(chat_client):
+    cursor = chat_client.get("/api/chat/search?patientId=P-1&limit=2").get_json()["nextCursor"]
+    response = chat_client.get(f"/api/chat/search?patientId=P-1&q=question&sort=relevance&cursor={cursor}")
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_cursor_without_kind_is_400(chat_client):
+    cursor = encode_cursor({"timestamp": datetime.datetime(2026, 1, 1), "_id": ObjectId()})
+    assert chat_client.get(f"/api/chat/search?patientId=P-1&cursor={cursor}").status_code == 400
+
+
+def test_garbage_cursor_is_400(chat_client):
+    assert chat_client.get("/api/chat/search?patientId=P-1&cursor=%%%").status_code == 400
@@ -0,0 +1,88 @@
+"""ResponseCache TTL expiry and LRU eviction."""
+import pytest
+
+from utils import response_cache as response_cache_module
+from utils.response_cache import ResponseCache, normalize_message
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache_module.time, "time", clock)
+    return clock
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.put("k", "v")
+    clock.now += 59
+    assert cache.get("k") == "v"
+    clock.now += 1
+    assert cache.get("k") is None
+    stats = cache.stats()
+    assert stats["entries"] == 0
+    assert stats["expirations"] == 1
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.put("short", "v", ttl=5)
+    cache.put("long", "v")
+    clock.now += 10
+    assert cache.get("short") is None
+    assert cache.get("long") == "v"
+
+
+def test_put_refreshes_expiry(clock):
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.put("k", "old")
+    clock.now += 50
+    cache.put("k", "new")
+    clock.now += 50
+    assert cache.get("k") == "new"
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_entries=3, ttl=60)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"  # "b" is now the least recently used
+    cache.put("d", "D")
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in ("a", "c", "d")] == ["A", "C", "D"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_overwriting_a_key_does_not_evict(clock):
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 3)
+    assert cache.stats()["evictions"] == 0
+    assert (cache.get("a"), cache.get("b")) == (3, 2)
+
+
+def test_size_stays_bounded(clock):
+    cache = ResponseCache(max_entries=50, ttl=60)
+    for i in range(500):
+        cache.put(str(i), i)
+    stats = cache.stats()
+    assert stats["entries"] == 50
+    assert stats["evictions"] == 450
+    assert cache.get("449") is None
+    assert cache.get("450") == 450
+
+
+def test_key_ignores_case_punctuation_and_spacing():
+    assert normalize_message("  What are the   VISITING hours?! ") == "what are the visiting hours"
+    assert ResponseCache.make_key("Visiting hours?", "ctx") == ResponseCache.make_key("visiting  hours", "ctx")
+    assert ResponseCache.make_key("visiting hours", "ctx") != ResponseCache.make_key("visiting hours", "other")
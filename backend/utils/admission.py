@@ -0,0 +1,105 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when the wait queue is full or a caller waited too long."""
+
+
+class AdmissionController:
+    """Caps concurrent calls to a slow backend behind a bounded priority queue.
+
+    Up to `max_concurrent` callers run at once. Up to `max_queue` more wait;
+    anyone beyond that is rejected immediately so the route can fall back.
+    Priority callers are admitted ahead of normal ones, then first come,
+    first served.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=16, max_wait=20.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (rank, seq)
+        self._seq = itertools.count()
+        self._running = 0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.priority_admitted = 0
+        self._recent_waits = deque(maxlen=500)
+        self.max_wait_seen = 0.0
+
+    @contextmanager
+    def slot(self, priority=False):
+        """Hold one slot for the duration of the `with` block."""
+        self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self, priority):
+        started = time.time()
+        with self._cond:
+            if self._running < self.max_concurrent and not self._waiting:
+                self._admit(priority, 0.0)
+                return
+
+            if len(self._waiting) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected("Queue is full")
+
+            ticket = (0 if priority else 1, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            deadline = started + self.max_wait
+            while not (self._waiting[0] == ticket and self._running < self.max_concurrent):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self.timed_out += 1
+                    self._cond.notify_all()
+                    raise AdmissionRejected("Timed out waiting for a slot")
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._admit(priority, time.time() - started)
+            # The next waiter may also fit if more than one slot is free
+            self._cond.notify_all()
+
+    def _admit(self, priority, waited):
+        self._running += 1
+        self.admitted += 1
+        if priority:
+            self.priority_admitted += 1
+        self._recent_waits.append(waited)
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+
+    def _release(self):
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._recent_waits)
+            return {
+                "running": self._running,
+                "queueDepth": len(self._waiting),
+                "maxConcurrent": self.max_concurrent,
+                "maxQueue": self.max_queue,
+                "admitted": self.admitted,
+                "priorityAdmitted": self.priority_admitted,
+                "rejected": self.rejected,
+                "timedOut": self.timed_out,
+                "avgWaitMs": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                "p95WaitMs": round(1000 * waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+                "maxWaitMs": round(1000 * self.max_wait_seen, 1),
+            }
@@ -0,0 +1,424 @@
+import datetime
+import threading
+import time
+from contextlib import contextmanager
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from utils.pagination import iter_batches
+
+DEFAULT_WARD_BEDS = 10
+# Seconds a ward name/index -> ward _id map is reused; an unknown ward reloads it sooner
+WARD_KEYS_TTL = 60
+WARD_KEYS_MISS_RELOAD = 5
+# A rebuild leaves rows written this recently to the admission that wrote them
+REBUILD_GRACE_SECONDS = 30
+# A worker that died mid-rebuild holds the startup lock at most this long
+REBUILD_LOCK_SECONDS = 600
+
+# Patient fields copied into the occupancy row
+OCCUPANT_PROJECTION = {
+    "patientId": 1,
+    "name": 1,
+    "age": 1,
+    "gender": 1,
+    "medicalSpecialty": 1,
+    "condition": 1,
+    "status": 1,
+    "wardType": 1,
+    "wardNumber": 1,
+    "cartNumber": 1,
+    "bedNumber": 1,
+    "assignedDoctor": 1,
+    "admissionDate": 1,
+}
+
+
+def bed_of(patient):
+    """(ward, bed) as strings, or None when the patient has no bed.
+
+    General wards use wardNumber + cartNumber; emergency admissions use
+    wardNumber + bedNumber.
+    """
+    ward = patient.get("wardNumber")
+    bed = patient.get("cartNumber") or patient.get("bedNumber")
+    if not ward or not bed:
+        return None
+    return str(ward), str(bed)
+
+
+def occupied_bed(patient):
+    """bed_of() for an admitted patient; None once discharged or only registered."""
+    if patient.get("status") != "admitted":
+        return None
+    return bed_of(patient)
+
+
+def ward_bed_count(ward, default=DEFAULT_WARD_BEDS):
+    """Beds in a ward: its `beds` count (or list), else the default."""
+    beds = ward.get("beds")
+    if isinstance(beds, int) and not isinstance(beds, bool) and beds > 0:
+        return beds
+    if isinstance(beds, list) and beds:
+        return len(beds)
+    return default
+
+
+def _object_id(value):
+    try:
+        return ObjectId(value) if value else None
+    except Exception:
+        return None
+
+
+class BedOccupancy:
+    """Materialized bed board: one row per occupied bed (admitted patient).
+
+    Rows use the patient's `_id` as their own, so admitting, moving or
+    discharging a patient is one atomic upsert or delete. Each row carries
+    the ward, bed, patient and doctor fields the boards show. Readers get
+    the whole board from one query over occupied beds, without scanning
+    patients.
+
+    A unique index on (ward, bed) makes the collection the reservation
+    system too. `claim()` inserts or moves the patient's row in one write,
+    and a concurrent claim on the same bed fails with a duplicate key. No
+    lock and no check-then-insert.
+
+    Patients name their ward by ward _id, ward name or board position
+    ("1"). `bed_key()` maps all three to the ward's _id before a row is
+    claimed or written, so one physical bed has one index entry. Wards
+    not in the wards collection keep the name they were given.
+    """
+
+    def __init__(self, collection, staff_collection, wards_collection=None):
+        self.collection = collection
+        self.staff_collection = staff_collection
+        self.wards_collection = wards_collection
+        self.locks = collection.database[f"{collection.name}_locks"]
+        self._ward_keys = {}
+        self._ward_keys_at = 0
+        self._ward_keys_lock = threading.Lock()
+
+    def ensure_indexes(self, patients_collection=None):
+        try:
+            self.collection.create_index("doctorId", name="doctorId")
+            if "ward_bed" in self.collection.index_information():
+                self.collection.drop_index("ward_bed")  # non-unique predecessor
+            try:
+                self._create_bed_index()
+            except (DuplicateKeyError, OperationFailure) as e:
+                if patients_collection is None:
+                    raise
+                # Double-booked beds from before the index existed: rebuild keeps one per bed
+                print(f"⚠️ Bed occupancy has double-booked beds, rebuilding: {e}")
+                with self._rebuild_lock() as acquired:
+                    if acquired:
+                        self.rebuild(patients_collection)
+                        self._create_bed_index()
+        except Exception as e:
+            print(f"Error creating bed occupancy indexes: {e}")
+
+    def _create_bed_index(self):
+        self.collection.create_index([("ward", 1), ("bed", 1)], name="ward_bed_unique", unique=True)
+
+    # ---------------- Ward keys ----------------
+    def _load_ward_keys(self):
+        keys = {}
+        wards = list(self.wards_collection.find({}, {"_id": 1, "name": 1}))
+        # Lowest precedence first: board position, then name, then _id
+        for idx, ward in enumerate(wards, start=1):
+            keys[str(idx)] = str(ward["_id"])
+        for ward in wards:
+            if ward.get("name"):
+                keys[str(ward["name"])] = str(ward["_id"])
+        for ward in wards:
+            keys[str(ward["_id"])] = str(ward["_id"])
+        return keys
+
+    def ward_key(self, ward):
+        """The ward's _id for a ward _id, name or board position; other values unchanged."""
+        ward = str(ward)
+        if self.wards_collection is None:
+            return ward
+        if self._ward_keys_due(ward):
+            with self._ward_keys_lock:
+                if self._ward_keys_due(ward):  # another thread may have just reloaded
+                    self._ward_keys = self._load_ward_keys()
+                    self._ward_keys_at = time.monotonic()
+        return self._ward_keys.get(ward, ward)
+
+    def _ward_keys_due(self, ward):
+        age = time.monotonic() - self._ward_keys_at
+        return age > WARD_KEYS_TTL or (ward not in self._ward_keys and age > WARD_KEYS_MISS_RELOAD)
+
+    def bed_key(self, patient):
+        """occupied_bed() with the ward normalized: the key rows are claimed and indexed under."""
+        bed = occupied_bed(patient)
+        if bed is None:
+            return None
+        return self.ward_key(bed[0]), bed[1]
+
+    # ---------------- Rows ----------------
+    def _doctor_names(self, doctor_ids):
+        doctor_ids = [d for d in set(doctor_ids) if d]
+        if not doctor_ids:
+            return {}
+        return {
+            d["_id"]: d.get("name")
+            for d in self.staff_collection.find({"_id": {"$in": doctor_ids}}, {"name": 1})
+        }
+
+    def _row(self, patient, bed, doctor_names):
+        doctor_id = _object_id(patient.get("assignedDoctor"))
+        return {
+            "_id": patient["_id"],
+            "ward": bed[0],
+            "bed": bed[1],
+            "wardType": patient.get("wardType"),
+            "status": patient.get("status"),
+            "patientId": patient.get("patientId"),
+            "name": patient.get("name"),
+            "age": patient.get("age"),
+            "gender": patient.get("gender"),
+            "diagnosis": patient.get("medicalSpecialty"),
+            "condition": patient.get("condition"),
+            "doctorId": doctor_id,
+            "doctorName": doctor_names.get(doctor_id),
+            "admissionDate": patient.get("admissionDate"),
+            "updatedAt": datetime.datetime.utcnow(),
+        }
+
+    # ---------------- Reservations ----------------
+    def claim(self, patient_oid, bed, current=None):
+        """Atomically reserves `bed` (ward, bed) for the patient.
+
+        `current` is the bed the caller last saw the patient in. The row
+        only moves from that bed, so two concurrent transfers of one patient
+        can't both win. Returns False if another patient holds the bed or
+        the patient moved in the meantime.
+        """
+        now = datetime.datetime.utcnow()
+        try:
+            if current is not None:
+                result = self.collection.update_one(
+                    {"_id": patient_oid, "ward": current[0], "bed": current[1]},
+                    {"$set": {"ward": bed[0], "bed": bed[1], "updatedAt": now}}
+                )
+                if result.matched_count:
+                    return True
+                if self.collection.find_one({"_id": patient_oid}, {"_id": 1}) is not None:
+                    return False
+            # No row yet (new admission, or a board that lost it): insert one
+            self.collection.insert_one({"_id": patient_oid, "ward": bed[0], "bed": bed[1], "updatedAt": now})
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def claim_many(self, claims):
+        """claim() for a batch of new admissions [(patient_oid, bed)] in one write.
+
+        Returns the patient ids that were refused because the bed is taken
+        (by an existing patient or earlier in the same batch).
+        """
+        now = datetime.datetime.utcnow()
+        rows = [{"_id": oid, "ward": bed[0], "bed": bed[1], "updatedAt": now} for oid, bed in claims]
+        if not rows:
+            return set()
+        try:
+            self.collection.insert_many(rows, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            return {rows[error["index"]]["_id"] for error in errors}
+        return set()
+
+    def release(self, patient_oid):
+        """Gives up a claim whose admission did not go through."""
+        self.remove_patient(patient_oid)
+
+    # ---------------- Writes ----------------
+    def sync_patient(self, patient):
+        """Fills in the patient's row at their bed, or frees it if they hold none."""
+        bed = self.bed_key(patient)
+        if bed is None:
+            self.collection.delete_one({"_id": patient["_id"]})
+            return None
+        row = self._row(patient, bed, self._doctor_names([_object_id(patient.get("assignedDoctor"))]))
+        try:
+            # Refreshes the row in place; only claim() moves a row between beds,
+            # so a sync that lost a race to a newer transfer can't undo it
+            self.collection.replace_one({"_id": patient["_id"], "ward": bed[0], "bed": bed[1]}, row, upsert=True)
+        except DuplicateKeyError:
+            print(f"⚠️ Bed {bed} not placed for {patient.get('patientId')}: bed taken or patient moved")
+            return None
+        return row
+
+    def sync_patients(self, patients):
+        """sync_patient() for a batch of claimed patients: one doctor lookup, one bulk write."""
+        placed = [(p, self.bed_key(p)) for p in patients]
+        placed = [(p, bed) for p, bed in placed if bed]
+        if not placed:
+            return 0
+        names = self._doctor_names([_object_id(p.get("assignedDoctor")) for p, _ in placed])
+        ops = [
+            ReplaceOne({"_id": p["_id"], "ward": bed[0], "bed": bed[1]}, self._row(p, bed, names), upsert=True)
+            for p, bed in placed
+        ]
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            print(f"⚠️ {len(e.details.get('writeErrors', []))} beds not placed: bed taken or patient moved")
+        return len(ops)
+
+    def remove_patient(self, patient_oid):
+        self.collection.delete_one({"_id": patient_oid})
+
+    def rename_doctor(self, doctor_oid, name):
+        """Keeps the denormalized doctor name in step with staff edits."""
+        self.collection.update_many({"doctorId": doctor_oid}, {"$set": {"doctorName": name}})
+
+    def rebuild(self, patients_collection, batch_size=1000):
+        """Brings every row in line with the patients collection, in place.
+
+        If several patients share a bed, the newest keeps it, as the old
+        board showed it. The board is never emptied: rows that are wrong are
+        deleted, then the right ones are upserted. Rows written after the
+        rebuild started (or within REBUILD_GRACE_SECONDS before it) belong to
+        concurrent admissions and transfers and are left alone.
+        """
+        started = datetime.datetime.utcnow()
+        cutoff = started - datetime.timedelta(seconds=REBUILD_GRACE_SECONDS)
+        query = {"status": "admitted", "wardNumber": {"$nin": [None, ""]}}
+
+        # Who should be where: newest patient first, one per bed
+        wanted, taken, conflicts = {}, set(), 0
+        bed_fields = {"status": 1, "wardNumber": 1, "cartNumber": 1, "bedNumber": 1}
+        for p in patients_collection.find(query, bed_fields).sort("_id", -1):
+            bed = self.bed_key(p)
+            if not bed:
+                continue
+            if bed in taken:
+                conflicts += 1
+                continue
+            taken.add(bed)
+            wanted[p["_id"]] = bed
+
+        # Drop rows for other patients or other beds first, so their beds are free
+        wrong = [
+            r["_id"] for r in self.collection.find({"updatedAt": {"$not": {"$gte": cutoff}}}, {"ward": 1, "bed": 1})
+            if wanted.get(r["_id"]) != (r.get("ward"), r.get("bed"))
+        ]
+        for batch in iter_batches(wrong, batch_size):
+            self.collection.delete_many({"_id": {"$in": batch}, "updatedAt": {"$not": {"$gte": cutoff}}})
+
+        count, skipped = 0, 0
+        rows = patients_collection.find({"_id": {"$in": list(wanted)}}, OCCUPANT_PROJECTION) if wanted else []
+        for batch in iter_batches(rows, batch_size):
+            names = self._doctor_names([_object_id(p.get("assignedDoctor")) for p in batch])
+            ops = [
+                # Only replaces a row nobody has touched since the rebuild started
+                ReplaceOne({"_id": p["_id"], "updatedAt": {"$lt": started}},
+                           self._row(p, wanted[p["_id"]], names), upsert=True)
+                for p in batch if p["_id"] in wanted
+            ]
+            if not ops:
+                continue
+            try:
+                self.collection.bulk_write(ops, ordered=False)
+                count += len(ops)
+            except BulkWriteError as e:
+                # A concurrent claim or transfer got there first
+                failed = len(e.details.get("writeErrors", []))
+                count += len(ops) - failed
+                skipped += failed
+        if conflicts:
+            print(f"⚠️ Bed occupancy rebuild skipped {conflicts} double-booked patients")
+        if skipped:
+            print(f"⚠️ Bed occupancy rebuild left {skipped} rows changed while it ran")
+        print(f"✅ Bed occupancy rebuilt: {count} occupied beds")
+        return count
+
+    @contextmanager
+    def _rebuild_lock(self):
+        """Lets one worker at a time rebuild; yields False if another one is."""
+        owner = ObjectId()
+        now = datetime.datetime.utcnow()
+        lease = {"owner": owner, "expiresAt": now + datetime.timedelta(seconds=REBUILD_LOCK_SECONDS)}
+        try:
+            self.locks.insert_one({"_id": "rebuild", **lease})
+            acquired = True
+        except DuplicateKeyError:
+            # Take over a lock whose holder died without releasing it
+            acquired = self.locks.find_one_and_update(
+                {"_id": "rebuild", "expiresAt": {"$lt": now}}, {"$set": lease}
+            ) is not None
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.locks.delete_one({"_id": "rebuild", "owner": owner})
+
+    def rebuild_if_stale(self, patients_collection):
+        """Rebuilds an empty board, or one holding discharged patients or unnormalized ward keys.
+
+        Every worker calls this at startup; one rebuilds, the rest skip.
+        """
+        try:
+            with self._rebuild_lock() as acquired:
+                if not acquired:
+                    print("Bed occupancy rebuild already running in another worker")
+                    return
+                stale = self.collection.find_one({"status": {"$nin": ["admitted", None]}}, {"_id": 1}) is not None
+                stale = stale or any(self.ward_key(w) != w for w in self.collection.distinct("ward"))
+                if stale or self.collection.estimated_document_count() == 0:
+                    self.rebuild(patients_collection)
+        except Exception as e:
+            print(f"Error rebuilding bed occupancy: {e}")
+
+    # ---------------- Reads ----------------
+    def by_ward(self, query=None):
+        """{ward: {bed: row}} for every occupied bed matching `query`."""
+        board = {}
+        for row in self.collection.find(query or {}):
+            board.setdefault(row["ward"], {})[row["bed"]] = row
+        return board
+
+
+def emergency_bed_rows(wards, occupancy):
+    """Flat emergency bed list for `wards` from a `by_ward()` board.
+
+    Each bed is a dict lookup in its ward's map, and the free-bed count is
+    computed once per ward, so the cost is O(beds).
+    """
+    bed_data = []
+    for ward in wards:
+        ward_id = str(ward["_id"])
+        total_beds = ward_bed_count(ward, default=0)
+        occupied = occupancy.get(ward_id, {})
+        available = total_beds - len(occupied)
+
+        for bed_number in range(1, total_beds + 1):
+            row = occupied.get(str(bed_number))
+            bed_info = {
+                "wardId": ward_id,
+                "wardName": ward.get("name", ""),
+                "wardType": ward["type"],
+                "bedNumber": bed_number,
+                "status": "occupied" if row else "available",
+                "specialty": ward.get("specialty", "general"),
+                "totalBeds": total_beds,
+                "availableBeds": available
+            }
+            if row:
+                bed_info["patient"] = {
+                    "name": row.get("name") or "Unknown",
+                    "condition": row.get("condition") or "Unknown",
+                    "patientId": row.get("patientId") or "",
+                    "assignedDoctor": str(row["doctorId"]) if row.get("doctorId") else None
+                }
+            bed_data.append(bed_info)
+    return bed_data
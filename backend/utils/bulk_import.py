@@ -0,0 +1,183 @@
+import codecs
+import json
+
+from pymongo.errors import BulkWriteError
+
+READ_CHUNK_BYTES = 64 * 1024
+# A single row larger than this is treated as malformed rather than buffered forever
+MAX_ROW_BYTES = 1024 * 1024
+NUMBER_CHARS = set("0123456789.eE+-")
+
+
+class PayloadError(ValueError):
+    """The payload can't be read any further (not a row-level problem)."""
+
+
+# ---------------- Parsing ----------------
+def iter_ndjson(stream):
+    """(row, data, error) per non-blank line; `row` is the line number."""
+    for number, line in enumerate(stream, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+
+
+def iter_json_array(stream, chunk_bytes=READ_CHUNK_BYTES):
+    """(row, data, None) per element of a top-level JSON array, read incrementally.
+
+    Only the current element and one read chunk are held in memory.
+    Raises PayloadError on a malformed array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer, position, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(chunk_bytes)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + (utf8.decode(chunk, final=eof) if isinstance(chunk, bytes) else chunk)
+        position = 0
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if position >= len(buffer) or buffer[position] != "[":
+        raise PayloadError("Expected a JSON array or NDJSON")
+    position += 1
+
+    row = 0
+    skip_whitespace()
+    if position < len(buffer) and buffer[position] == "]":
+        return
+    while True:
+        skip_whitespace()
+        try:
+            data, end = decoder.raw_decode(buffer, position)
+        except ValueError as e:
+            if eof or len(buffer) - position > MAX_ROW_BYTES:
+                raise PayloadError(f"Invalid JSON at row {row + 1}: {e}")
+            fill()
+            continue
+        if not eof and (end == len(buffer) or (isinstance(data, (int, float)) and buffer[end] in NUMBER_CHARS)):
+            # A number may continue in the next chunk ("1." + "5e3"); decode again with more input
+            fill()
+            continue
+        row += 1
+        position = end
+        yield row, data, None
+
+        skip_whitespace()
+        if position >= len(buffer):
+            raise PayloadError(f"Unexpected end of array after row {row}")
+        if buffer[position] == "]":
+            return
+        if buffer[position] != ",":
+            raise PayloadError(f"Expected ',' after row {row}")
+        position += 1
+
+
+def iter_request_rows(stream, content_type="", fmt=None):
+    """Rows from an NDJSON or JSON-array upload, chosen by `fmt` or the content type."""
+    fmt = (fmt or "").lower()
+    if fmt == "ndjson" or (not fmt and "ndjson" in (content_type or "")):
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
+
+
+# ---------------- Writing ----------------
+class ImportReport:
+    """Counts plus per-row errors (the first `max_errors` of them)."""
+
+    def __init__(self, max_errors=1000):
+        self.max_errors = max_errors
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, row, error):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": error})
+
+    def to_dict(self):
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+            "errorsTruncated": self.failed > len(self.errors),
+        }
+
+
+def import_rows(rows, build, insert_chunk, chunk_size=1000, report=None):
+    """Validates rows with `build(data)` and hands them to `insert_chunk` in chunks.
+
+    `build` returns the document to insert or raises ValueError with the
+    message for the report. `insert_chunk(chunk, report)` gets a list of
+    (row, doc) and records what it inserted or rejected. A PayloadError
+    from `rows` propagates after the rows read so far are written.
+    """
+    report = report or ImportReport()
+    chunk = []
+    try:
+        for row, data, error in rows:
+            report.received += 1
+            if error is None:
+                try:
+                    chunk.append((row, build(data)))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                report.fail(row, error)
+                continue
+            if len(chunk) >= chunk_size:
+                insert_chunk(chunk, report)
+                chunk = []
+    except PayloadError:
+        # Keep everything read before the payload broke off
+        if chunk:
+            insert_chunk(chunk, report)
+        raise
+    if chunk:
+        insert_chunk(chunk, report)
+    return report
+
+
+def insert_unordered(collection, chunk, report):
+    """insert_many(ordered=False) of a (row, doc) chunk: one round trip, per-row failures.
+
+    Returns (inserted docs, failed docs).
+    """
+    docs = [doc for _, doc in chunk]
+    failed_at = {}
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            failed_at[error["index"]] = error.get("errmsg", "Write failed")
+    for index, message in failed_at.items():
+        report.fail(chunk[index][0], describe_write_error(message))
+    inserted = [doc for index, doc in enumerate(docs) if index not in failed_at]
+    report.inserted += len(inserted)
+    return inserted, [docs[index] for index in failed_at]
+
+
+def describe_write_error(message):
+    if "E11000" in message or "duplicate key" in message:
+        return f"Duplicate: {message.split('dup key:')[-1].strip()}" if "dup key:" in message else "Duplicate key"
+    return message
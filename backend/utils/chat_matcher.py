@@ -0,0 +1,191 @@
+import re
+import threading
+from collections import Counter, OrderedDict
+from difflib import SequenceMatcher
+
+FUZZY_CUTOFF = 0.7
+URGENT_MARKER = "emergency"
+
+
+class ChatMatcher:
+    """FAQ and symptom matching compiled once from the chatbot maps.
+
+    Gives the same answers as the original scan-everything functions:
+
+    * FAQ questions are substring-matched in map order. Each question is
+      indexed under one of its inner words, which must appear as a whole
+      token in any query that contains the question, so only a few
+      candidates are checked per message.
+    * Keyword rules are compiled into one regex per rule and tried in order.
+    * Symptom keywords are kept in an inverted index. The fuzzy step follows
+      `difflib.get_close_matches(keyword, words, cutoff=0.7)`, but candidate
+      keywords are pre-filtered by length and letter counts, and results are
+      memoized per user word.
+    """
+
+    def __init__(self, faq_map, faq_keywords, symptom_map, memo_size=5000):
+        self.faq_map = dict(faq_map)
+        self.faq_keywords = [(list(words), question) for words, question in faq_keywords]
+        self.symptom_map = dict(symptom_map)
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._compile_faq()
+        self._compile_symptoms()
+
+    # ---------------- FAQ ----------------
+    def _compile_faq(self):
+        questions = list(self.faq_map.items())
+        word_freq = Counter(w for q, _ in questions for w in set(q.split(" ")[1:-1]))
+
+        self.faq_always = []        # (order, question, answer) with no inner word to index on
+        self.faq_index = {}         # inner word -> [(order, question, answer)]
+        for order, (q, ans) in enumerate(questions):
+            inner = [w for w in q.split(" ")[1:-1] if w]
+            if not inner:
+                self.faq_always.append((order, q, ans))
+                continue
+            anchor = min(inner, key=lambda w: word_freq[w])
+            self.faq_index.setdefault(anchor, []).append((order, q, ans))
+
+        self.faq_rules = []
+        urgent_words = []
+        for words, question in self.faq_keywords:
+            if question in self.faq_map and words:
+                pattern = re.compile("|".join(re.escape(w) for w in words))
+                self.faq_rules.append((pattern, self.faq_map[question]))
+                if URGENT_MARKER in question:
+                    urgent_words.extend(words)
+        self.urgent_faq_pattern = (
+            re.compile("|".join(re.escape(w) for w in urgent_words)) if urgent_words else None
+        )
+
+    def match_faq(self, user_input):
+        query = user_input.lower()
+
+        # Direct match, in map order
+        candidates = list(self.faq_always)
+        for token in set(query.split(" ")):
+            candidates.extend(self.faq_index.get(token, ()))
+        for _, q, ans in sorted(candidates, key=lambda c: c[0]):
+            if q in query:
+                return ans
+
+        # Keyword matching for better coverage
+        for pattern, ans in self.faq_rules:
+            if pattern.search(query):
+                return ans
+
+        return None
+
+    # ---------------- Symptoms ----------------
+    def _compile_symptoms(self):
+        self.symptom_entries = []
+        self.keyword_index = {}     # keyword -> [entry index, one per occurrence]
+        urgent, routine = set(), set()
+        for idx, (symptoms, info) in enumerate(self.symptom_map.items()):
+            self.symptom_entries.append(info)
+            for word in symptoms.split():
+                self.keyword_index.setdefault(word, []).append(idx)
+            (urgent if URGENT_MARKER in info.lower() else routine).update(symptoms.split())
+        # Words shared with routine entries (e.g. "pain") do not make a message urgent
+        self.urgent_symptom_keywords = urgent - routine
+
+        # Fuzzy lookup tables: keywords bucketed by length, with letter counts
+        self.keywords_by_length = {}
+        for keyword in self.keyword_index:
+            self.keywords_by_length.setdefault(len(keyword), []).append((keyword, Counter(keyword)))
+
+    def _fuzzy_keywords(self, word):
+        """Keywords that `get_close_matches(keyword, [word], cutoff=0.7)` would accept."""
+        with self._memo_lock:
+            hit = self._memo.get(word)
+            if hit is not None:
+                self._memo.move_to_end(word)
+                return hit
+
+        found = []
+        la = len(word)
+        word_counts = None
+        for lb, entries in self.keywords_by_length.items():
+            # Same bound as SequenceMatcher.real_quick_ratio()
+            if 2.0 * min(la, lb) / (la + lb) < FUZZY_CUTOFF:
+                continue
+            if word_counts is None:
+                word_counts = Counter(word)
+            for keyword, keyword_counts in entries:
+                if keyword == word:
+                    found.append(keyword)
+                    continue
+                # Same bound as SequenceMatcher.quick_ratio()
+                common = sum((word_counts & keyword_counts).values())
+                if 2.0 * common / (la + lb) < FUZZY_CUTOFF:
+                    continue
+                # A matcher per pair: requests run on several threads at once
+                if SequenceMatcher(None, word, keyword).ratio() >= FUZZY_CUTOFF:
+                    found.append(keyword)
+
+        hit = frozenset(found)
+        with self._memo_lock:
+            self._memo[word] = hit
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return hit
+
+    def match_symptoms(self, user_input):
+        user_words = set(user_input.lower().split())
+
+        hits = set()
+        for word in user_words:
+            hits |= self._fuzzy_keywords(word)
+
+        counts = Counter()
+        for keyword in hits:
+            for idx in self.keyword_index[keyword]:
+                counts[idx] += 1
+
+        best_match = None
+        highest_matches = 0
+        for idx in sorted(counts):
+            matches = counts[idx]
+            if matches > highest_matches and matches >= 2:
+                highest_matches = matches
+                best_match = self.symptom_entries[idx]
+
+        return best_match
+
+    # ---------------- Urgency ----------------
+    def is_urgent(self, user_input):
+        """True when the message uses the emergency FAQ keywords or a symptom
+        keyword whose answer sends the patient to emergency."""
+        query = user_input.lower()
+        if self.urgent_faq_pattern and self.urgent_faq_pattern.search(query):
+            return True
+        if self.urgent_symptom_keywords:
+            for word in set(query.split()):
+                if self._fuzzy_keywords(word) & self.urgent_symptom_keywords:
+                    return True
+        return False
+
+
+def load_maps_from_collection(collection):
+    """Reads FAQ and symptom entries from Mongo.
+
+    Documents look like `{"type": "faq", "question": ..., "answer": ...,
+    "keywords": [...]}` or `{"type": "symptom", "symptoms": ..., "info": ...}`
+    and are applied in `order` (then insertion) order. Returns None when the
+    collection holds no entries.
+    """
+    faq_map, faq_keywords, symptom_map = {}, [], {}
+    for doc in collection.find({}).sort([("order", 1), ("_id", 1)]):
+        if doc.get("type") == "faq" and doc.get("question") and doc.get("answer"):
+            question = doc["question"].lower()
+            faq_map[question] = doc["answer"]
+            if doc.get("keywords"):
+                faq_keywords.append(([k.lower() for k in doc["keywords"]], question))
+        elif doc.get("type") == "symptom" and doc.get("symptoms") and doc.get("info"):
+            symptom_map[doc["symptoms"].lower()] = doc["info"]
+
+    if not faq_map and not symptom_map:
+        return None
+    return faq_map, faq_keywords, symptom_map
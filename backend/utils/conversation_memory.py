@@ -0,0 +1,99 @@
+import datetime
+import os
+import threading
+from collections import OrderedDict, deque
+
+
+class InProcessMemory:
+    """Last few chat turns per patient, kept in this worker's memory.
+
+    Patients are evicted least-recently-used once `max_patients` is reached,
+    so the total size is bounded by `max_patients * max_turns` turns.
+    """
+
+    def __init__(self, max_turns=3, max_patients=10000):
+        self.max_turns = max_turns
+        self.max_patients = max_patients
+        self._lock = threading.Lock()
+        self._turns = OrderedDict()  # patientId -> deque of (question, answer)
+
+    def append(self, patient_id, question, answer):
+        with self._lock:
+            turns = self._turns.get(patient_id)
+            if turns is None:
+                turns = self._turns[patient_id] = deque(maxlen=self.max_turns)
+            turns.append((question, answer))
+            self._turns.move_to_end(patient_id)
+            while len(self._turns) > self.max_patients:
+                self._turns.popitem(last=False)
+
+    def recent(self, patient_id):
+        with self._lock:
+            turns = self._turns.get(patient_id)
+            if not turns:
+                return []
+            self._turns.move_to_end(patient_id)
+            return list(turns)
+
+    def clear(self, patient_id):
+        with self._lock:
+            self._turns.pop(patient_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "patients": len(self._turns), "maxPatients": self.max_patients}
+
+
+class MongoMemory:
+    """Chat turns shared by every worker, one document per patient.
+
+    Each document is `{_id: patientId, turns: [...], updatedAt}`. Appends
+    trim the array to `max_turns` with `$push`/`$slice`, reads are a single
+    `_id` lookup, and a TTL index on `updatedAt` expires idle conversations.
+    """
+
+    def __init__(self, collection, max_turns=3, ttl_seconds=86400):
+        self.collection = collection
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+        try:
+            self.collection.create_index("updatedAt", expireAfterSeconds=ttl_seconds)
+        except Exception as e:
+            print(f"Could not create conversation TTL index: {e}")
+
+    def append(self, patient_id, question, answer):
+        self.collection.update_one(
+            {"_id": patient_id},
+            {
+                "$push": {"turns": {"$each": [{"q": question, "a": answer}], "$slice": -self.max_turns}},
+                "$set": {"updatedAt": datetime.datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+    def recent(self, patient_id):
+        doc = self.collection.find_one({"_id": patient_id}, {"turns": 1})
+        if not doc:
+            return []
+        return [(t.get("q"), t.get("a")) for t in doc.get("turns", [])]
+
+    def clear(self, patient_id):
+        self.collection.delete_one({"_id": patient_id})
+
+    def stats(self):
+        return {"backend": "mongo", "ttlSeconds": self.ttl_seconds}
+
+
+def create_conversation_memory(collection=None, backend=None, max_turns=3):
+    """Builds the backend named by CHAT_MEMORY_BACKEND ("memory" or "mongo")."""
+    backend = (backend or os.getenv("CHAT_MEMORY_BACKEND", "memory")).lower()
+    if backend == "mongo" and collection is not None:
+        return MongoMemory(
+            collection,
+            max_turns=max_turns,
+            ttl_seconds=int(os.getenv("CHAT_MEMORY_TTL", "86400"))
+        )
+    return InProcessMemory(
+        max_turns=max_turns,
+        max_patients=int(os.getenv("CHAT_MEMORY_MAX_PATIENTS", "10000"))
+    )
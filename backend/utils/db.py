@@ -1,27 +1,126 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
 from werkzeug.security import generate_password_hash
 import os
+import threading
 from datetime import datetime
 
+# ---------------- Connection Settings ----------------
+# env var -> (MongoClient option, type). Unset vars keep pymongo's defaults.
+CLIENT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': ('maxPoolSize', int),
+    'MONGO_MIN_POOL_SIZE': ('minPoolSize', int),
+    'MONGO_MAX_IDLE_TIME_MS': ('maxIdleTimeMS', int),
+    'MONGO_MAX_CONNECTING': ('maxConnecting', int),
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': ('waitQueueTimeoutMS', int),
+    'MONGO_CONNECT_TIMEOUT_MS': ('connectTimeoutMS', int),
+    'MONGO_SOCKET_TIMEOUT_MS': ('socketTimeoutMS', int),
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': ('serverSelectionTimeoutMS', int),
+    'MONGO_READ_PREFERENCE': ('readPreference', str),
+    'MONGO_WRITE_CONCERN': ('w', lambda v: int(v) if v.isdigit() else v),
+    'MONGO_JOURNAL': ('journal', lambda v: v.lower() in ('1', 'true', 'yes')),
+    'MONGO_RETRY_WRITES': ('retryWrites', lambda v: v.lower() in ('1', 'true', 'yes')),
+    'MONGO_APP_NAME': ('appname', str),
+}
+
+def client_options():
+    """MongoClient keyword options from the MONGO_* environment variables."""
+    options = {'serverSelectionTimeoutMS': 5000, 'appname': 'clucare'}
+    for env, (option, cast) in CLIENT_OPTIONS.items():
+        value = os.getenv(env)
+        if value not in (None, ''):
+            options[option] = cast(value)
+    return options
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters per server, fed by pymongo's pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.servers = {}
+
+    def _bump(self, event, **deltas):
+        address = f"{event.address[0]}:{event.address[1]}"
+        with self._lock:
+            server = self.servers.setdefault(address, {
+                'open': 0, 'inUse': 0, 'waiting': 0, 'created': 0, 'closed': 0,
+                'checkouts': 0, 'checkoutFailures': 0, 'cleared': 0, 'peakInUse': 0, 'peakWaiting': 0,
+            })
+            for key, delta in deltas.items():
+                server[key] += delta
+            server['peakInUse'] = max(server['peakInUse'], server['inUse'])
+            server['peakWaiting'] = max(server['peakWaiting'], server['waiting'])
+
+    def pool_created(self, event):
+        self._bump(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump(event, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump(event, open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump(event, open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        self._bump(event, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._bump(event, waiting=-1, checkoutFailures=1)
+
+    def connection_checked_out(self, event):
+        self._bump(event, waiting=-1, inUse=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._bump(event, inUse=-1)
+
+    def snapshot(self):
+        with self._lock:
+            return {address: dict(server) for address, server in self.servers.items()}
+
+
 class Database:
     def __init__(self):
         self.client = None
         self.db = None
+        self.database = None
+        self.pool_stats = PoolStats()
         self.connect()
 
     def connect(self):
+        # One client (one pool) per worker, shared by every blueprint
+        mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
+        self.options = client_options()
+        self.client = MongoClient(mongodb_uri, event_listeners=[self.pool_stats], **self.options)
+        self.database = self.client[os.getenv('MONGODB_DB', 'hospital_db')]
+        self.db = self.database
         try:
-            # MongoDB connection
-            mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-            self.client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000)
-            self.db = self.client['hospital_db']
             self.client.server_info()
             print("✅ Successfully connected to MongoDB")
             
         except Exception as e:
             print(f"❌ MongoDB connection error: {e}")
+            # Only login falls back to mocks; blueprints keep the real client,
+            # which reconnects once the server is up
             self._create_mock_collections()
 
+    def stats(self):
+        return {
+            'database': self.database.name,
+            'options': dict(self.options),
+            'pools': self.pool_stats.snapshot(),
+        }
+
     def _create_mock_collections(self):
         """Create mock collections for development"""
         print("⚠️  Using mock collections for development")
@@ -87,8 +186,8 @@ db_instance = None
 
 def initialize_db():
     """Initialize the database connection"""
-    global db_instance
-    db_instance = Database()
+    # Reuses the instance created on import, so the worker keeps a single pool
+    db_instance = get_db()
     db_instance.initialize_default_admin()
     return db_instance
 
@@ -98,6 +197,11 @@ def get_db():
     if db_instance is None:
         db_instance = Database()
     return db_instance
+
+def get_database():
+    """The shared hospital database (always the real client, never the mocks)."""
+    return get_db().database
+
 def find_user_by_email(email):
     """Find user by email in both users and staff collections"""
     user = db.users.find_one({'email': email})
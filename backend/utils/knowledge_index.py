@@ -0,0 +1,224 @@
+import glob
+import json
+import math
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "the", "to",
+    "what", "when", "where", "which", "who", "will", "with", "you", "your",
+}
+
+
+def _stem(word):
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    return [_stem(w) for w in WORD_RE.findall((text or "").lower()) if w not in STOPWORDS]
+
+
+META_FILE = "meta.json"
+# Indexes built before arrays were versioned
+LEGACY_FILES = {"matrix": "matrix.npy", "idf": "idf.npy"}
+
+
+def _smoothed_idf(n_docs, doc_freq):
+    return math.log((1 + n_docs) / (1 + doc_freq)) + 1.0
+
+
+def _read_files(index_dir):
+    try:
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            return json.load(f).get("files", LEGACY_FILES)
+    except (OSError, ValueError):
+        return {}
+
+
+# ---------------- Build ----------------
+def build_index(passages, out_dir):
+    """Writes a TF-IDF index for `passages` to `out_dir`.
+
+    Each passage is a dict with `text`, plus an optional `answer` returned
+    verbatim on confident hits and an optional `source`. Writes:
+    matrix-<version>.npy (L2-normalized float32 rows, one per passage),
+    idf-<version>.npy and meta.json (vocabulary, passages and the array
+    file names).
+
+    Other workers may have the current arrays memory-mapped, so nothing
+    is rewritten in place. Everything is written to a temp dir and moved
+    in with os.replace(); meta.json goes last, so a reader sees the old
+    index or the new one, never a mix. The previous version's arrays are
+    kept for workers still loading it; older ones are removed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    token_lists = [tokenize(p["text"]) for p in passages]
+
+    vocab = {}
+    doc_freq = Counter()
+    for tokens in token_lists:
+        for term in set(tokens):
+            if term not in vocab:
+                vocab[term] = len(vocab)
+            doc_freq[term] += 1
+
+    n_docs = len(passages)
+    idf = np.zeros(len(vocab), dtype=np.float32)
+    for term, col in vocab.items():
+        idf[col] = _smoothed_idf(n_docs, doc_freq[term])
+
+    matrix = np.zeros((n_docs, len(vocab)), dtype=np.float32)
+    for row, tokens in enumerate(token_lists):
+        for term, count in Counter(tokens).items():
+            col = vocab[term]
+            matrix[row, col] = (1.0 + math.log(count)) * idf[col]
+        norm = np.linalg.norm(matrix[row])
+        if norm:
+            matrix[row] /= norm
+
+    version = f"{int(time.time() * 1000)}-{os.getpid()}"
+    files = {"matrix": f"matrix-{version}.npy", "idf": f"idf-{version}.npy"}
+    previous = _read_files(out_dir)
+
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=out_dir)
+    try:
+        np.save(os.path.join(tmp_dir, files["matrix"]), matrix)
+        np.save(os.path.join(tmp_dir, files["idf"]), idf)
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"vocab": vocab, "passages": passages, "files": files}, f, ensure_ascii=False)
+        for name in [*files.values(), META_FILE]:
+            os.replace(os.path.join(tmp_dir, name), os.path.join(out_dir, name))
+    finally:
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+    _remove_old_arrays(out_dir, keep=set(files.values()) | set(previous.values()))
+    print(f"✅ Knowledge index built: {n_docs} passages, {len(vocab)} terms -> {out_dir}")
+    return n_docs
+
+
+def _remove_old_arrays(index_dir, keep):
+    for name in os.listdir(index_dir):
+        if name.endswith(".npy") and name not in keep:
+            try:
+                os.remove(os.path.join(index_dir, name))
+            except OSError:
+                pass  # still mapped by a worker on a platform that won't delete it
+
+
+# ---------------- Search ----------------
+class KnowledgeIndex:
+    """Read-only TF-IDF index; the matrix is memory-mapped from disk."""
+
+    def __init__(self, vocab=None, idf=None, matrix=None, passages=None, index_dir=None, stamp=None):
+        self.vocab = vocab or {}
+        self.idf = idf
+        self.matrix = matrix
+        self.passages = passages or []
+        self.index_dir = index_dir
+        self.stamp = stamp
+
+    @classmethod
+    def load(cls, index_dir):
+        """Loads an index, or returns an empty one if none has been built yet."""
+        meta_path = os.path.join(index_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            print(f"⚠️ No knowledge index at {index_dir}; retrieval disabled")
+            return cls(index_dir=index_dir)
+        stamp = _stamp(meta_path)
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        files = meta.get("files", LEGACY_FILES)
+        idf = np.load(os.path.join(index_dir, files["idf"]))
+        matrix = np.load(os.path.join(index_dir, files["matrix"]), mmap_mode="r")
+        print(f"✅ Knowledge index loaded: {len(meta['passages'])} passages")
+        return cls(meta["vocab"], idf, matrix, meta["passages"], index_dir, stamp)
+
+    def changed_on_disk(self):
+        """True once another process has swapped in a newer index."""
+        if self.index_dir is None:
+            return False
+        return _stamp(os.path.join(self.index_dir, META_FILE)) != self.stamp
+
+    def __len__(self):
+        return len(self.passages)
+
+    def search(self, query, k=3):
+        """Returns up to `k` (score, passage) pairs by cosine similarity."""
+        if not self.passages:
+            return []
+        counts = Counter(tokenize(query))
+        known = {t: c for t, c in counts.items() if t in self.vocab}
+        if not known:
+            return []
+
+        cols = np.fromiter((self.vocab[t] for t in known), dtype=np.int64)
+        weights = np.fromiter(((1.0 + math.log(c)) for c in known.values()), dtype=np.float32)
+        weights *= self.idf[cols]
+        # Terms no passage contains still count towards the query's length (with the
+        # idf of an unseen term); leaving them out would inflate every score
+        unseen_idf = _smoothed_idf(len(self.passages), 0)
+        unseen = sum(((1.0 + math.log(c)) * unseen_idf) ** 2 for t, c in counts.items() if t not in known)
+        weights /= math.sqrt(float(np.dot(weights, weights)) + unseen)
+
+        # Only the query's columns matter for the dot product
+        scores = np.asarray(self.matrix[:, cols] @ weights)
+        top = np.argsort(-scores)[:k]
+        return [(float(scores[i]), self.passages[i]) for i in top if scores[i] > 0]
+
+
+def _stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# ---------------- Sources ----------------
+def passages_from_docs(docs_dir):
+    """Splits every .md / .txt file under `docs_dir` into paragraph passages."""
+    passages = []
+    for path in sorted(glob.glob(os.path.join(docs_dir, "**", "*.*"), recursive=True)):
+        if not path.endswith((".md", ".txt")):
+            continue
+        with open(path, encoding="utf-8") as f:
+            paragraphs = [p.strip() for p in re.split(r"\n\s*\n", f.read())]
+        source = os.path.relpath(path, docs_dir)
+        passages += [{"text": p, "source": source} for p in paragraphs if len(p) > 20]
+    return passages
+
+
+def passages_from_db(db):
+    """Department, ward and staff-by-specialty passages from Mongo."""
+    passages = []
+    for dept in db["departments"].find({}, {"name": 1}):
+        doctors = [s["name"] for s in db["staff"].find(
+            {"department": dept["name"], "role": "doctor"}, {"name": 1}) if s.get("name")]
+        text = f"The {dept['name']} department"
+        text += f" has these doctors: {', '.join(doctors)}." if doctors else "."
+        passages.append({"text": text, "source": "departments"})
+
+    for ward in db["wards"].find({}, {"name": 1, "specialty": 1, "type": 1}):
+        kind = f" {ward['type']}" if ward.get("type") else ""
+        passages.append({
+            "text": f"{ward.get('name')} is a{kind} ward for {ward.get('specialty', 'general')} care.",
+            "source": "wards"
+        })
+    return passages
+
+
+def passages_from_maps(faq_map, symptom_map):
+    passages = [{"text": f"{q} {a}", "answer": a, "source": "faq"} for q, a in faq_map.items()]
+    passages += [{"text": f"{s} {info}", "answer": info, "source": "symptoms"} for s, info in symptom_map.items()]
+    return passages
@@ -0,0 +1,52 @@
+import threading
+import time
+
+
+class LazyResource:
+    """Builds an expensive object (ML model, client) on first use.
+
+    `get()` runs `loader` once, from whichever thread asks first; the others
+    wait for it. A failed load returns None and is retried on the next call.
+    `warm_up()` starts the load in a background thread so the first request
+    does not pay for it.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self.load_seconds = None
+        self.error = None
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if self._loaded:
+                return self._value
+            started = time.time()
+            try:
+                self._value = self.loader()
+                self._loaded = True
+                self.error = None
+                self.load_seconds = round(time.time() - started, 3)
+                print(f"✅ {self.name} loaded in {self.load_seconds}s")
+            except Exception as e:
+                self.error = str(e)
+                print(f"❌ Error loading {self.name}: {e}")
+            return self._value
+
+    def warm_up(self):
+        thread = threading.Thread(target=self.get, name=f"warm-up-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            "name": self.name,
+            "loaded": self._loaded,
+            "loadSeconds": self.load_seconds,
+            "error": self.error,
+        }
@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+
+# Change streams need a replica set; standalone servers fail with this code
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+class LiveBoard:
+    """Pushes a keyed board to any number of subscribers as deltas.
+
+    `build()` returns the whole board as {(topic, key): item}. One
+    background thread rebuilds it when something changed and diffs it
+    against the last build. Each subscriber gets only the items that were
+    added, changed or removed. So N open screens cost one rebuild per
+    change, not N full reads per poll interval.
+
+    Changes are detected by `watch(notify)`, which blocks on a change
+    stream and calls notify() per event. Without it, or if it fails
+    (standalone or in-memory Mongo), the thread polls every
+    `poll_interval` seconds and only publishes when the diff is non-empty.
+    In-process writes can call notify() for an immediate refresh in
+    either mode.
+    """
+
+    def __init__(self, build, watch=None, poll_interval=2.0, debounce=0.25,
+                 resync_interval=60.0, watch_retry=30.0, queue_size=100):
+        self.build = build
+        self.watch = watch
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.resync_interval = resync_interval
+        self.watch_retry = watch_retry
+        self.queue_size = queue_size
+        self.mode = "change-stream" if watch else "poll"
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._state = {}
+        self._version = 0
+        self._stale = True
+        self._subscribers = set()
+        self._started = False
+        self.builds = 0
+        self.published = 0
+
+    # ---------------- Subscribers ----------------
+    def subscribe(self):
+        """A new subscriber queue plus (version, state) to send it first."""
+        self._start()
+        with self._lock:
+            fresh = not self._subscribers or self._stale
+        if fresh:
+            # Nobody kept the board current while it was idle
+            self.refresh()
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        subscriber.resync = False
+        with self._lock:
+            self._subscribers.add(subscriber)
+            return subscriber, self._version, dict(self._state)
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def snapshot(self):
+        with self._lock:
+            return self._version, dict(self._state)
+
+    def notify(self):
+        self._dirty.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "subscribers": len(self._subscribers),
+                "version": self._version,
+                "items": len(self._state),
+                "builds": self.builds,
+                "published": self.published,
+            }
+
+    # ---------------- Publisher ----------------
+    def refresh(self):
+        """Rebuilds the board and publishes the difference, if any."""
+        with self._refresh_lock:
+            state = self.build()
+            self.builds += 1
+            with self._lock:
+                changes = diff_states(self._state, state)
+                self._state = state
+                self._stale = False
+                if not changes:
+                    return 0
+                self._version += 1
+                message = (self._version, changes)
+                for subscriber in self._subscribers:
+                    try:
+                        subscriber.put_nowait(message)
+                    except queue.Full:
+                        # Too slow to keep up; it gets a fresh snapshot instead
+                        subscriber.resync = True
+                self.published += 1
+            return len(changes)
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="live-board", daemon=True).start()
+        if self.watch:
+            threading.Thread(target=self._watch, name="live-board-watch", daemon=True).start()
+
+    def _run(self):
+        while True:
+            timeout = self.poll_interval if self.mode == "poll" else self.resync_interval
+            self._dirty.wait(timeout)
+            with self._lock:
+                idle = not self._subscribers
+                if idle:
+                    self._stale = True
+            if idle:
+                self._dirty.clear()
+                continue
+            time.sleep(self.debounce)  # one rebuild for a burst of writes
+            self._dirty.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing live board: {e}")
+
+    def _watch(self):
+        while True:
+            try:
+                self.mode = "change-stream"
+                self.watch(self.notify)
+            except Exception as e:
+                self.mode = "poll"
+                self.notify()  # wakes the publisher into polling, and catches anything missed
+                if isinstance(e, NotImplementedError) or getattr(e, "code", None) == CHANGE_STREAMS_UNSUPPORTED:
+                    print(f"⚠️ Change streams unavailable, live board polls every {self.poll_interval}s")
+                    return
+                print(f"⚠️ Live board change stream failed, polling until retry: {e}")
+            time.sleep(self.watch_retry)
+
+
+def diff_states(old, new):
+    """Changes between two boards: [{"topic", "key", "op", "data"}], removals last."""
+    changes = [
+        {"topic": topic, "key": key, "op": "upsert", "data": item}
+        for (topic, key), item in new.items()
+        if old.get((topic, key)) != item
+    ]
+    changes += [
+        {"topic": topic, "key": key, "op": "remove", "data": None}
+        for (topic, key) in old
+        if (topic, key) not in new
+    ]
+    return changes
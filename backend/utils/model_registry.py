@@ -0,0 +1,134 @@
+import threading
+import time
+import datetime
+
+# Models we try in order; the first one installed on the Ollama server wins.
+PREFERRED_MODELS = ["llama3:instruct", "llama3:latest", "llama2:latest", "mistral:latest"]
+DEFAULT_MODEL = "llama3:latest"
+
+
+def is_connection_error(error):
+    """True if Ollama could not be reached at all, as opposed to a slow or failed chat."""
+    if isinstance(error, ConnectionError):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+class ModelRegistry:
+    """Keeps the chosen Ollama model in memory and refreshes it in the background.
+
+    `lister` is any callable returning the payload of `ollama.list()`.
+    A healthy registry re-checks every `ttl` seconds; after a failure it
+    retries every `retry_interval` seconds until Ollama answers again.
+    """
+
+    def __init__(self, lister, preferred_models=None, default_model=DEFAULT_MODEL,
+                 ttl=300, retry_interval=15):
+        self.lister = lister
+        self.preferred_models = preferred_models or PREFERRED_MODELS
+        self.default_model = default_model
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.model = None
+        self.available_models = []
+        self.status = "unknown"  # unknown, up, down
+        self.last_checked = None
+        self.last_error = None
+        self.consecutive_failures = 0
+
+    # ---------------- Refresh ----------------
+    def _pick_model(self, model_names):
+        for model in self.preferred_models:
+            if model in model_names:
+                return model
+        return self.default_model
+
+    def refresh(self):
+        """Ask Ollama for its installed models and update the cached choice."""
+        try:
+            available = self.lister()
+            model_names = [m.get("name") or m.get("model") for m in available.get("models", [])]
+            model = self._pick_model(model_names)
+            with self._lock:
+                self.available_models = model_names
+                self.model = model
+                self.status = "up"
+                self.last_error = None
+                self.consecutive_failures = 0
+                self.last_checked = time.time()
+            print(f"✅ Ollama model registry refreshed, using: {model}")
+        except Exception as e:
+            self.mark_failure(e)
+        return self.status == "up"
+
+    def mark_failure(self, error):
+        """Record that Ollama is unreachable so requests fail fast until the next retry."""
+        with self._lock:
+            self.status = "down"
+            self.last_error = str(error)
+            self.consecutive_failures += 1
+            self.last_checked = time.time()
+        print(f"Error checking Ollama models: {error}")
+
+    def _is_stale(self):
+        if self.last_checked is None:
+            return True
+        interval = self.ttl if self.status == "up" else self.retry_interval
+        return time.time() - self.last_checked >= interval
+
+    # ---------------- Background Thread ----------------
+    def _run(self):
+        while not self._stop.is_set():
+            if self._is_stale():
+                self.refresh()
+            interval = self.ttl if self.status == "up" else self.retry_interval
+            self._stop.wait(min(interval, 5))
+
+    def start(self):
+        """Start the background refresher (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ollama-model-registry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ---------------- Lookups ----------------
+    def get_model(self):
+        """Return the cached model name, or None while Ollama is known to be down."""
+        if self.last_checked is None:
+            # First request before the background thread has reported in
+            self.refresh()
+        elif self._is_stale() and not (self._thread and self._thread.is_alive()):
+            self.refresh()
+
+        with self._lock:
+            if self.status != "up":
+                return None
+            return self.model
+
+    def is_available(self):
+        return self.status == "up"
+
+    def health(self):
+        with self._lock:
+            return {
+                "status": self.status,
+                "model": self.model,
+                "availableModels": list(self.available_models),
+                "lastChecked": datetime.datetime.utcfromtimestamp(self.last_checked).isoformat()
+                if self.last_checked else None,
+                "lastError": self.last_error,
+                "consecutiveFailures": self.consecutive_failures,
+            }
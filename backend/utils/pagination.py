@@ -0,0 +1,127 @@
+import base64
+import datetime
+import json
+
+from bson import ObjectId
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Payload key for the sort a cursor belongs to; "$" can't start a field name
+KIND_KEY = "$kind"
+
+
+def encode_cursor(values, kind=None):
+    """Turns the sort-key values of the last returned row into an opaque token.
+
+    `kind` names the sort order when an endpoint has several; decode_cursor
+    then refuses the token under any other order.
+    """
+    payload = {KIND_KEY: kind} if kind else {}
+    for key, value in values.items():
+        if isinstance(value, ObjectId):
+            payload[key] = {"$oid": str(value)}
+        elif isinstance(value, datetime.datetime):
+            payload[key] = {"$date": value.isoformat()}
+        else:
+            payload[key] = value
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, kind=None):
+    """Reverses encode_cursor; raises InvalidCursor on anything malformed.
+
+    With `kind`, a cursor made for a different sort order is refused too.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        token_kind = payload.pop(KIND_KEY, None)
+        values = {}
+        for key, value in payload.items():
+            if isinstance(value, dict) and "$oid" in value:
+                values[key] = ObjectId(value["$oid"])
+            elif isinstance(value, dict) and "$date" in value:
+                values[key] = datetime.datetime.fromisoformat(value["$date"])
+            else:
+                values[key] = value
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+    if token_kind != kind:
+        raise InvalidCursor("Invalid cursor: it was made for a different sort order")
+    return values
+
+
+def parse_limit(raw, default=50, maximum=200):
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def after_cursor_filter(sort_fields, cursor, descending=True):
+    """Mongo filter for rows strictly after `cursor` in a compound sort.
+
+    `sort_fields` is the ordered list of sort keys, e.g. ["timestamp", "_id"],
+    all sorted in the same direction.
+    """
+    op = "$lt" if descending else "$gt"
+    clauses = []
+    for i, field in enumerate(sort_fields):
+        clause = {f: cursor[f] for f in sort_fields[:i]}
+        clause[field] = {op: cursor[field]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def parse_fields(raw, allowed=None):
+    """Projection for a comma-separated `fields` param, or None for the default.
+
+    Unknown names are dropped when `allowed` is given; `_id` always comes back.
+    """
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip() and not f.strip().startswith("$")]
+    if allowed is not None:
+        fields = [f for f in fields if f in allowed]
+    return {f: 1 for f in fields} or None
+
+
+def fetch_page(collection, query, projection=None, sort_fields=("_id",), cursor=None, limit=50,
+               descending=False):
+    """One page of `collection` in `sort_fields` order.
+
+    Returns (docs, next_cursor); next_cursor is None on the last page.
+    """
+    sort_fields = list(sort_fields)
+    if cursor:
+        query = {"$and": [query, after_cursor_filter(sort_fields, cursor, descending)]}
+    direction = -1 if descending else 1
+    docs = list(
+        collection.find(query, projection)
+        .sort([(f, direction) for f in sort_fields])
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor({f: docs[-1].get(f) for f in sort_fields})
+    return docs, next_cursor
+
+
+def iter_batches(rows, size=500):
+    """Groups any iterable (e.g. a Mongo cursor) into lists of up to `size`."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,40 @@
+from pymongo import UpdateOne
+
+
+def normalize_key(value):
+    """Case- and whitespace-insensitive form used for equality lookups."""
+    return " ".join(str(value or "").split()).casefold()
+
+
+def patient_lookup_keys(doc):
+    """Normalized keys for whichever of patientId / name the document carries."""
+    keys = {}
+    if doc.get("patientId") is not None:
+        keys["patientIdKey"] = normalize_key(doc["patientId"])
+    if doc.get("name") is not None:
+        keys["nameKey"] = normalize_key(doc["name"])
+    return keys
+
+
+def ensure_patient_lookup_index(collection):
+    """Backfills missing keys, then adds the unique index used by chatbot login."""
+    try:
+        ops = []
+        for doc in collection.find({"patientIdKey": {"$exists": False}}, {"patientId": 1, "name": 1}):
+            keys = patient_lookup_keys(doc)
+            if keys:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": keys}))
+            if len(ops) >= 1000:
+                collection.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+
+        collection.create_index(
+            "patientIdKey",
+            name="patientIdKey_unique",
+            unique=True,
+            partialFilterExpression={"patientIdKey": {"$type": "string"}}
+        )
+    except Exception as e:
+        print(f"Error preparing patient lookup keys: {e}")
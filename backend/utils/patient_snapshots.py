@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Only what the chat prompt reads: demographics plus the newest lab
+# report, prescription and appointment.
+SNAPSHOT_PROJECTION = {
+    "patientId": 1,
+    "name": 1,
+    "age": 1,
+    "gender": 1,
+    "labReports": {"$slice": -1},
+    "prescriptions": {"$slice": -1},
+    "appointments": {"$slice": -1},
+}
+
+
+class PatientSnapshotCache:
+    """Bounded LRU of compact per-patient prompt context.
+
+    Writers call `invalidate(patientId)` or `invalidate_by_id(_id)` after
+    changing a patient, and the next chat reloads the snapshot. Other
+    worker processes pick the change up when the entry's `ttl` runs out.
+    """
+
+    def __init__(self, max_entries=2000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.collection = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # patientId -> (loaded_at, snapshot)
+        self._ids = {}                 # str(_id) -> patientId
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, collection):
+        self.collection = collection
+
+    def get(self, patient_id):
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            if entry and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(patient_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        snapshot = self.collection.find_one({"patientId": patient_id}, SNAPSHOT_PROJECTION)
+        if snapshot is None:
+            return None
+
+        with self._lock:
+            # Skip caching if a writer invalidated anything while we were loading
+            if generation == self._generation:
+                self._entries[patient_id] = (time.time(), snapshot)
+                self._entries.move_to_end(patient_id)
+                self._ids[str(snapshot["_id"])] = patient_id
+                while len(self._entries) > self.max_entries:
+                    _, (_, old) = self._entries.popitem(last=False)
+                    self._ids.pop(str(old["_id"]), None)
+        return snapshot
+
+    def invalidate(self, patient_id):
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(patient_id, None)
+            if entry:
+                self._ids.pop(str(entry[1]["_id"]), None)
+
+    def invalidate_by_id(self, object_id):
+        with self._lock:
+            patient_id = self._ids.get(str(object_id))
+        if patient_id is not None:
+            self.invalidate(patient_id)
+        else:
+            with self._lock:
+                self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared instance read by the chatbot and invalidated by patient writers
+patient_snapshots = PatientSnapshotCache(
+    max_entries=int(os.getenv("PATIENT_SNAPSHOT_SIZE", "2000")),
+    ttl=int(os.getenv("PATIENT_SNAPSHOT_TTL", "300")),
+)
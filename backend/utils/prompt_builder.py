@@ -0,0 +1,164 @@
+import math
+import re
+import threading
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)."""
+    return int(math.ceil(len(text or "") / 4.0))
+
+
+def _words(text):
+    return set(WORD_RE.findall((text or "").lower()))
+
+
+def _related(a, b):
+    """Loose word match so "cardiologist" finds "Cardiology"."""
+    if len(a) < 4 or len(b) < 4:
+        return a == b
+    return a[:5] == b[:5] or a in b or b in a
+
+
+class PromptBuilder:
+    """Builds Ollama chat messages with a stable prefix and a token budget.
+
+    The system message holds the instructions and the staff roster. It stays
+    byte-identical between turns, so Ollama can reuse its KV cache for it.
+    If the roster is over `staff_budget`, the system message lists only the
+    specialties, and the doctors relevant to the question go in the user
+    turn. Older history turns are dropped first to keep the whole prompt
+    under `budget`.
+    """
+
+    def __init__(self, instructions, budget=1500, staff_budget=400, history_budget=500,
+                 knowledge_budget=300):
+        self.instructions = instructions
+        self.budget = budget
+        self.staff_budget = staff_budget
+        self.history_budget = history_budget
+        self.knowledge_budget = knowledge_budget
+
+    # ---------------- Staff ----------------
+    @staticmethod
+    def _staff_line(member):
+        return f"- {member['name']} ({member.get('specialization', 'N/A')})"
+
+    def _system_prefix(self, roster):
+        lines = [self._staff_line(m) for m in roster]
+        staff_text = "\n".join(lines)
+        if roster and estimate_tokens(staff_text) <= self.staff_budget:
+            return f"{self.instructions}\n\nHospital Staff:\n{staff_text}", True
+
+        specialties = sorted({m.get("specialization", "N/A") for m in roster})
+        prefix = self.instructions
+        if specialties:
+            prefix += "\n\nDepartments: " + ", ".join(specialties)
+        return prefix, False
+
+    def relevant_staff(self, user_message, roster):
+        # Ignore short words like "dr" that would match every name
+        message_words = {w for w in _words(user_message) if len(w) >= 3}
+        relevant = []
+        for member in roster:
+            member_words = _words(member.get("specialization")) | _words(member.get("name"))
+            if any(_related(w, m) for w in member_words for m in message_words):
+                relevant.append(member)
+        return relevant
+
+    # ---------------- Messages ----------------
+    def build(self, user_message, patient_fragment="", history=None, roster=None, passages=None):
+        """Returns (messages, usage, context) for one chat turn.
+
+        `passages` are retrieved hospital facts, best first. `context` is the
+        prompt text other than the query and history, for use in cache keys.
+        """
+        roster = roster or []
+        system_prefix, full_roster = self._system_prefix(roster)
+
+        staff_turn = ""
+        staff_included = len(roster) if full_roster else 0
+        if not full_roster:
+            lines, used = [], 0
+            for member in self.relevant_staff(user_message, roster):
+                line = self._staff_line(member)
+                cost = estimate_tokens(line) + 1
+                if used + cost > self.staff_budget:
+                    break
+                lines.append(line)
+                used += cost
+            if lines:
+                staff_turn = "Relevant Staff:\n" + "\n".join(lines) + "\n\n"
+            staff_included = len(lines)
+
+        knowledge_turn, used, passages_included = "", 0, 0
+        for passage in passages or []:
+            cost = estimate_tokens(passage) + 1
+            if used + cost > self.knowledge_budget:
+                break
+            knowledge_turn += f"- {passage}\n"
+            used += cost
+            passages_included += 1
+        if knowledge_turn:
+            knowledge_turn = f"Hospital Information:\n{knowledge_turn}\n"
+
+        user_turn = f"{knowledge_turn}{staff_turn}{patient_fragment}User query: {user_message}"
+        fixed_tokens = estimate_tokens(system_prefix) + estimate_tokens(user_turn)
+
+        # Newest turns first until the history or total budget runs out
+        history_messages, history_tokens = [], 0
+        history_room = min(self.history_budget, max(self.budget - fixed_tokens, 0))
+        for question, answer in reversed(history or []):
+            pair = [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+            cost = estimate_tokens(question) + estimate_tokens(answer)
+            if history_tokens + cost > history_room:
+                break
+            history_messages = pair + history_messages
+            history_tokens += cost
+
+        messages = [{"role": "system", "content": system_prefix}]
+        messages += history_messages
+        messages.append({"role": "user", "content": user_turn})
+
+        usage = {
+            "prefixTokens": estimate_tokens(system_prefix),
+            "historyTokens": history_tokens,
+            "turnTokens": estimate_tokens(user_turn),
+            "estimatedPromptTokens": fixed_tokens + history_tokens,
+            "budget": self.budget,
+            "historyTurns": len(history_messages) // 2,
+            "historyTurnsDropped": len(history or []) - len(history_messages) // 2,
+            "staffIncluded": staff_included,
+            "staffTotal": len(roster),
+            "passagesIncluded": passages_included,
+        }
+        context = f"{system_prefix}\n{knowledge_turn}{staff_turn}{patient_fragment}"
+        return messages, usage, context
+
+
+class PrefillStats:
+    """Running totals of estimated vs. Ollama-reported prompt tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.estimated_tokens = 0
+        self.evaluated_tokens = 0
+        self.reported = 0
+
+    def record(self, usage):
+        with self._lock:
+            self.requests += 1
+            self.estimated_tokens += usage.get("estimatedPromptTokens", 0)
+            if usage.get("promptEvalCount") is not None:
+                self.reported += 1
+                self.evaluated_tokens += usage["promptEvalCount"]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "avgEstimatedPromptTokens": round(self.estimated_tokens / self.requests, 1) if self.requests else 0.0,
+                "avgPrefillTokens": round(self.evaluated_tokens / self.reported, 1) if self.reported else 0.0,
+            }
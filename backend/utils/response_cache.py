@@ -0,0 +1,88 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_message(message):
+    """Lowercase, drop punctuation and collapse whitespace so near-identical questions share a key."""
+    message = re.sub(r"[^\w\s]", " ", (message or "").lower())
+    return " ".join(message.split())
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of LLM answers with a TTL per entry."""
+
+    def __init__(self, max_entries=1000, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(message, context=""):
+        """Key = normalized message + hash of the context fragment the prompt used."""
+        context_hash = hashlib.sha1(context.encode("utf-8")).hexdigest()
+        return f"{normalize_message(message)}|{context_hash}"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hitRate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Shared cache for chatbot LLM replies
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CHAT_CACHE_SIZE", "1000")),
+    ttl=int(os.getenv("CHAT_CACHE_TTL", "600")),
+)
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+
+
+class RosterCache:
+    """Process-wide copy of the staff roster (name + specialization).
+
+    The roster is loaded lazily on the first `get()` and reloaded after `ttl`
+    seconds or after `invalidate()`. Blueprints that write to the staff
+    collection call `invalidate()` so the next reader sees the change; other
+    worker processes pick it up when their TTL expires.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.collection = None
+        self._lock = threading.Lock()
+        self._generation_lock = threading.Lock()
+        self._roster = None
+        self._loaded_at = 0
+        self._generation = 0
+
+    def bind(self, collection):
+        """Point the cache at the staff collection it should read from."""
+        self.collection = collection
+        self.invalidate()
+
+    def _is_stale(self):
+        return self._roster is None or time.time() - self._loaded_at >= self.ttl
+
+    def reload(self):
+        generation = self._generation
+        docs = list(self.collection.find({}, {'name': 1, 'specialization': 1, '_id': 0}))
+        roster = [
+            {"name": d["name"], "specialization": d.get("specialization", "N/A")}
+            for d in docs if d.get("name")
+        ]
+        with self._generation_lock:
+            # A writer invalidated while we were reading: keep the next reader loading
+            if generation == self._generation:
+                self._roster = roster
+                self._loaded_at = time.time()
+        return roster
+
+    def get(self):
+        """Return the cached roster, loading it from Mongo only when stale."""
+        if self.collection is None:
+            return []
+        roster = self._roster
+        if roster is None or self._is_stale():
+            with self._lock:
+                # Another thread may have reloaded while we waited
+                roster = self._roster
+                if roster is None or self._is_stale():
+                    roster = self.reload()
+        return roster
+
+    def invalidate(self):
+        with self._generation_lock:
+            self._generation += 1
+            self._roster = None
+            self._loaded_at = 0
+
+
+# Shared instance used by the chatbot and invalidated by the staff writers
+staff_roster = RosterCache(ttl=int(os.getenv("STAFF_ROSTER_TTL", "300")))
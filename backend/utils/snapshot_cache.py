@@ -0,0 +1,36 @@
+import threading
+import time
+
+
+class SnapshotCache:
+    """Holds the last result of an expensive `loader()` for `ttl` seconds.
+
+    Callers that arrive while a reload is running wait for it and share its
+    result, so N concurrent pollers cost one load, not N.
+    """
+
+    def __init__(self, loader, ttl=10):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = 0
+        self.loads = 0
+
+    def get(self):
+        if self._value is not None and time.time() - self._loaded_at < self.ttl:
+            return self._value
+        with self._lock:
+            # Another caller may have reloaded while we waited for the lock
+            if self._value is None or time.time() - self._loaded_at >= self.ttl:
+                self._value = self.loader()
+                self._loaded_at = time.time()
+                self.loads += 1
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0
+
+    def age(self):
+        return round(time.time() - self._loaded_at, 1) if self._loaded_at else None
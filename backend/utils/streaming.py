@@ -0,0 +1,29 @@
+from flask import Response, current_app, stream_with_context
+
+
+def ndjson_response(rows):
+    """Streams JSON-able rows one per line, with the app's JSON encoder (same output as jsonify)."""
+    def generate():
+        for row in rows:
+            yield current_app.json.dumps(row) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+def sse_event(payload, event=None, event_id=None):
+    """One server-sent event carrying `payload` as JSON (app encoder, so datetimes work)."""
+    message = f"event: {event}\n" if event else ""
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {current_app.json.dumps(payload)}\n\n"
+
+
+def event_stream_response(events):
+    """Streams already formatted server-sent events."""
+    return Response(stream_with_context(events), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
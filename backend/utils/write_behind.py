@@ -0,0 +1,155 @@
+import atexit
+import queue
+import threading
+import time
+
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+
+class BatchWriter:
+    """Bounded write-behind queue that flushes documents with insert_many.
+
+    Request threads call `submit()` and return immediately. A daemon thread
+    flushes when `batch_size` documents are waiting or `flush_interval`
+    seconds have passed, whichever is first. A failed batch is retried up to
+    `max_retries` times and then dropped. When the queue is full, new
+    documents are dropped rather than blocking the request.
+    """
+
+    def __init__(self, collection, name="writer", max_queue=10000, batch_size=100,
+                 flush_interval=1.0, max_retries=3):
+        self.collection = collection
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._registered = False
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.retried = 0
+        self.batches = 0
+
+    # ---------------- Producer Side ----------------
+    def submit(self, doc):
+        """Queue a document; returns False if it had to be dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(doc)
+        except queue.Full:
+            self._count("dropped")
+            print(f"⚠️ {self.name}: queue full, dropping document")
+            return False
+        self._count("submitted")
+        return True
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+            self._thread.start()
+            if not self._registered:
+                atexit.register(self.stop)
+                self._registered = True
+
+    def _count(self, field, amount=1):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    # ---------------- Flusher Thread ----------------
+    def _take_batch(self, first_timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=first_timeout))
+        except queue.Empty:
+            return batch
+
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(first_timeout=self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.collection.insert_many(pending, ordered=False)
+                self._count("written", len(pending))
+                self._count("batches")
+                return
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                failed = {err["index"] for err in errors if err.get("code") != DUPLICATE_KEY}
+                # Duplicates were written by an earlier attempt
+                self._count("written", len(pending) - len(failed))
+                pending = [doc for i, doc in enumerate(pending) if i in failed]
+                if not pending:
+                    self._count("batches")
+                    return
+                print(f"{self.name}: {len(pending)} documents failed in batch: {errors[:1]}")
+            except Exception as e:
+                print(f"{self.name}: batch insert failed ({e})")
+
+            if attempt < self.max_retries:
+                self._count("retried", len(pending))
+                time.sleep(min(0.5 * (2 ** attempt), 5))
+
+        self._count("dropped", len(pending))
+        print(f"❌ {self.name}: dropped {len(pending)} documents after {self.max_retries} retries")
+
+    # ---------------- Shutdown ----------------
+    def flush(self):
+        """Write everything still queued on the calling thread."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "retried": self.retried,
+                "batches": self.batches,
+            }